@@ -33,8 +33,6 @@ import typer
 from rich import print
 from rich.table import Table
 
-from ..experiments.run_experiment import main as _run_one  # Typer function; callable as regular def
-from ..eval import metrics as _metrics
 
 app = typer.Typer(add_completion=False)
 
@@ -81,6 +79,16 @@ def run(
     ledger_max_rows: int = typer.Option(8, "--ledger-max-rows", help="Max rows in the in-prompt ledger (NLEL)"),
     verifier_passes: int = typer.Option(1, "--verifier-passes", help="Passes for tot+verifier"),
     verifier_strictness: float = typer.Option(0.5, "--verifier-strictness", help="Strictness for tot+verifier"),
+    label_concurrency: str = typer.Option("serial", "--label-concurrency", help="NLEL label expansion: serial | threads | batch | auto"),
+    fused_controller: bool = typer.Option(False, "--fused-controller", help="One call per node for NLEL labels and controls"),
+    tuner_cache: int = typer.Option(0, "--tuner-cache", help="Memoize up to N tuner control vectors (NLEL); 0 = off"),
+    no_dedup: bool = typer.Option(False, "--no-dedup", help="Disable duplicate-step merging and score reuse"),
+    no_budget_guard: bool = typer.Option(False, "--no-budget-guard", help="Do not trim expansions to the remaining budget"),
+    frontier_width: int = typer.Option(0, "--frontier-width", help="Max nodes expanded per level (0 = every survivor; 1 = greedy chain)"),
+    workers: int = typer.Option(1, "--workers", help="Worker processes per run"),
+    resume: bool = typer.Option(False, "--resume", help="Skip rows already present in the output JSONL files"),
+    tokenizer: str = typer.Option(None, "--tokenizer", help="Token counter for backend-estimated usage (approx | tiktoken[:<encoding|model>] | hf:<path>)"),
+    trace: bool = typer.Option(False, "--trace", help="Write a per-call model trace per method and budget to <out>/traces/ (Chrome trace JSON)"),
 ):
     """
     Run admissions-minimal subset across methods × budgets with an LToT-compatible API.
@@ -104,8 +112,10 @@ def run(
     table.add_row(dataset, model, str(n or "all"), ", ".join(methods_l), ", ".join(f"{b:.2f}×" for b in budgets_l), str(outdir))
     print(table)
 
+    # Imported here so `report` does not load the controllers and model backends.
+    from ..experiments.run_experiment import main as _run_one  # Typer function; callable as regular def
     for controller in methods_l:
-        for b in budgets_l:
+        for i, b in enumerate(budgets_l):
             print(f"[bold]→ Running[/bold] {controller} @ {b:.2f}×")
             # Note: call the Typer-decorated function as a normal function. This bypasses CLI parsing and prints its own summary.
             _run_one(
@@ -124,6 +134,19 @@ def run(
                 quantize_controls=0,
                 random_labels=False,
                 report_sac=False,
+                sac_budgets="0.5,1.0,2.0",
+                anytime=False,
+                label_concurrency=label_concurrency,
+                frontier_width=frontier_width,
+                no_dedup=no_dedup,
+                no_budget_guard=no_budget_guard,
+                tuner_cache=tuner_cache,
+                fused_controller=fused_controller,
+                workers=workers,
+                # All budgets of a method share one JSONL; later budgets append to it.
+                resume=resume or i > 0,
+                tokenizer=tokenizer,
+                trace_path=str(outdir / "traces" / f"{controller}_{b:g}x.json") if trace else None,
             )
 
 @app.command()
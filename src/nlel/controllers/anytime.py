@@ -0,0 +1,28 @@
+from typing import Dict, Any, List, Optional
+
+def record_level(trace: Optional[List[Dict[str, Any]]], depth: int, tokens_total: int, expansions: int, leaf: bool) -> None:
+    """Append the cumulative state at the end of one tree level (no-op when tracing is off)."""
+    if trace is not None:
+        trace.append({"depth": int(depth), "tokens_total": int(tokens_total), "expansions": int(expansions), "leaf": bool(leaf)})
+
+def outcome_at_budget(res: Dict[str, Any], trace: List[Dict[str, Any]], budget_tokens: int) -> Dict[str, Any]:
+    """
+    Derive what a run capped at `budget_tokens` would have returned from a run at a larger budget and its
+    per-level trace. Mirrors the controllers' loop: a level starts only while tokens_total < cap, and the
+    search stops after the first level that yields a leaf. If the leaf level is reachable under the cap the
+    outcome (including verifier tokens) is the full result; otherwise the run ends leafless at the level
+    where the cap was crossed.
+
+    Exact for level-atomic controllers (run_tot, run_instance with concurrent label expansion). Serial NLEL
+    can stop mid-level at the smaller cap, and the tuner context reports the larger budget, so derived NLEL
+    rows are an approximation of a direct run. Budget-guarded runs (controllers.budget) cannot be replayed:
+    the large run was trimmed against its own cap, so run_experiment and sweep refuse anytime derivation
+    for tot/nlel unless the guard is off.
+    """
+    spent = 0; expansions = 0
+    for lvl in trace:
+        if spent >= budget_tokens:
+            return {**res, "final": None, "tokens_total": spent, "expansions": expansions, "correct": None, "verified": None}
+        spent = lvl["tokens_total"]; expansions = lvl["expansions"]
+        if lvl["leaf"]: return dict(res)
+    return dict(res)
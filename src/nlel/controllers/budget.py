@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+from ..config import DEFAULT_SCHEMA_BOUNDS
+from ..prompts import get_template
+from ..tokens import TokenCounter
+
+class BudgetGuard:
+    """
+    Predicts what a batch of step generations will cost before it is dispatched and trims it to the budget
+    that remains. A row is charged its prompt tokens, its completion, and the evaluator call that scores it:
+    the evaluator prompt for the task, the candidate and the evaluator's own `max_tokens`. The completion is
+    taken as `max_tokens` until `observe` has seen steps of this run, then as the longest completion seen
+    (capped by `max_tokens`); a later, longer step can overshoot the cap by the difference.
+
+    `fit` keeps the longest prefix of rows that fits; if not even one row fits at the requested `max_tokens`
+    it shortens the step down to `min_tokens` (default: the schema's lower bound) and otherwise skips it.
+    """
+    def __init__(self, budget_tokens: int, counter: TokenCounter, task: str, evaluator_max_tokens: int = 64, min_tokens: Optional[int] = None):
+        self.budget_tokens = int(budget_tokens); self.counter = counter
+        self.min_tokens = int(min_tokens if min_tokens is not None else DEFAULT_SCHEMA_BOUNDS.max_tokens[0])
+        self.eval_tokens = counter.count(get_template("evaluator.txt").format(task=task, candidate="")) + int(evaluator_max_tokens)
+        self.trimmed = 0; self.skipped = 0; self.longest: Optional[int] = None
+    def observe(self, metas: List[Dict[str, Any]]) -> None:
+        """Record the completion lengths of dispatched steps (their generation metas)."""
+        lengths = [int((m or {}).get("usage", {}).get("completion_tokens", 0)) for m in metas]
+        if lengths: self.longest = max(self.longest or 0, max(lengths))
+    def remaining(self, spent: int) -> int:
+        return max(0, self.budget_tokens - int(spent))
+    def row_cost(self, prompt_tokens: int, max_tokens: int) -> int:
+        step = max_tokens if self.longest is None else min(max_tokens, self.longest)
+        return prompt_tokens + 2 * step + self.eval_tokens  # the completion is paid again inside the evaluator prompt
+    def fit(self, prompts: List[str], max_tokens: int, remaining: int) -> Tuple[int, int]:
+        """(rows, max_tokens) to dispatch out of `prompts` within `remaining` tokens; rows=0 means skip."""
+        counts = self.counter.count_many(prompts); total = 0; rows = 0
+        for n in counts:
+            cost = self.row_cost(n, max_tokens)
+            if total + cost > remaining: break
+            total += cost; rows += 1
+        if rows == len(prompts): return rows, max_tokens
+        if rows > 0: self.trimmed += 1; return rows, max_tokens
+        shortened = (remaining - counts[0] - self.eval_tokens) // 2
+        if shortened < self.min_tokens: self.skipped += 1; return 0, 0
+        self.trimmed += 1; return 1, min(max_tokens, shortened)
+
+class LevelBudget:
+    """
+    The tokens left for one level, handed to its expansions in pair order: expansion `turn` calls `take` once
+    its prompts and controls are known and waits until every earlier turn has taken its share or `release`d
+    it. Expansions running in threads therefore trim and skip exactly as a sequential pass over the pairs would.
+    Every turn must end in `take` or `release` (call `release` in a finally), or later turns wait forever.
+    """
+    def __init__(self, guard: BudgetGuard, remaining: int):
+        self.guard = guard; self.remaining = int(remaining); self._turn = 0; self._cond = threading.Condition()
+    def take(self, turn: int, prompts: List[str], max_tokens: int) -> Tuple[int, int]:
+        """`guard.fit` against what the earlier turns left; the predicted cost of the kept rows is reserved."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._turn == turn)
+            try:
+                rows, max_tokens = self.guard.fit(prompts, max_tokens, self.remaining)
+                self.remaining -= sum(self.guard.row_cost(n, max_tokens) for n in self.guard.counter.count_many(prompts[:rows]))
+                return rows, max_tokens
+            finally:
+                self._turn += 1; self._cond.notify_all()
+    def release(self, turn: int) -> None:
+        """Pass `turn` without reserving anything; a no-op once it has taken its share."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._turn >= turn)
+            if self._turn == turn: self._turn += 1; self._cond.notify_all()
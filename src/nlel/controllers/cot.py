@@ -3,7 +3,7 @@ from ..models.base import TextModel
 from ..tokens import TokenBank
 from ..eval.evaluator import ExactMatchChecker
 def run_cot(task: str, model: TextModel, max_tokens: int = 256, gold_answer: Optional[str] = None) -> Dict[str, Any]:
-    text, meta = model.generate(f"Solve step by step. End with 'Final Answer: <answer>'.\n\nProblem:\n{task}\n", temperature=0.2, top_p=0.9, max_tokens=max_tokens)
+    text, meta = model.generate(f"Solve step by step. End with 'Final Answer: <answer>'.\n\nProblem:\n{task}\n", temperature=0.2, top_p=0.9, max_tokens=max_tokens, stop_on_final_answer=True)
     tb = TokenBank(); tb.add(**meta.get("usage", {}))
     correct = None
     if gold_answer is not None:
@@ -13,7 +13,7 @@ def run_sc_cot(task: str, model: TextModel, samples: int = 5, max_tokens: int =
     from collections import Counter; import re
     tb = TokenBank(); texts = []
     for _ in range(samples):
-        t, meta = model.generate(f"Solve step by step and end with 'Final Answer: <answer>'.\n\nProblem:\n{task}\n", temperature=0.4, top_p=0.95, max_tokens=max_tokens)
+        t, meta = model.generate(f"Solve step by step and end with 'Final Answer: <answer>'.\n\nProblem:\n{task}\n", temperature=0.4, top_p=0.95, max_tokens=max_tokens, stop_on_final_answer=True)
         texts.append(t); tb.add(**meta.get("usage", {}))
     def extract(x):
         m = re.search(r"Final Answer\s*:\s*(.+)$", x, re.IGNORECASE | re.MULTILINE)
@@ -0,0 +1,99 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib, os, re, threading, zlib
+import numpy as np
+
+_P = (1 << 61) - 1
+_WORD = re.compile(r"\w+|[^\w\s]")
+_NUM = re.compile(r"\d+(?:\.\d+)?")
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class StepDeduper:
+    """
+    Tree-wide index of candidate steps for one search instance: exact matches by digest of the normalized
+    text, near-duplicates by MinHash over word shingles (crc32-hashed, so signatures are reproducible across
+    processes) with LSH banding and an estimated-Jaccard check. Near-duplicates must also carry the same
+    numbers, so steps that differ only in an intermediate result are kept apart.
+
+    score_batch reuses the (mu, sigma) of any step committed at an earlier level and scores repeated texts
+    within one batch once; unique merges the duplicates of a level, keeping the first copy. Safe to share
+    between threads: the index and counters are updated under a lock (scoring calls run outside it).
+    Env: NLEL_DEDUP_THRESHOLD (estimated Jaccard for near-duplicates, default 0.9; >= 1 keeps exact only).
+    """
+    def __init__(self, threshold: Optional[float] = None, num_perm: int = 64, bands: int = 16, shingle: int = 3, seed: int = 1):
+        self.threshold = float(threshold if threshold is not None else os.getenv("NLEL_DEDUP_THRESHOLD", "0.9"))
+        self.num_perm = int(num_perm); self.bands = int(bands); self.rows = self.num_perm // self.bands; self.shingle = int(shingle)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 29, size=self.num_perm, dtype=np.uint64); self._b = rng.integers(0, 1 << 29, size=self.num_perm, dtype=np.uint64)
+        self._exact: Dict[bytes, int] = {}; self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._sigs: List[np.ndarray] = []; self._nums: List[Tuple[str, ...]] = []; self._scores: List[Tuple[float, float]] = []
+        self.reused = 0; self.merged = 0; self._lock = threading.Lock()
+    def _digest(self, text: str) -> bytes:
+        return hashlib.blake2b(_norm(text).encode("utf-8"), digest_size=16).digest()
+    def _signature(self, text: str) -> np.ndarray:
+        toks = _WORD.findall(text.lower()); k = self.shingle
+        grams = [" ".join(toks[i:i + k]) for i in range(max(1, len(toks) - k + 1))]
+        h = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+        return ((self._a[:, None] * h[None, :] + self._b[:, None]) % _P).min(axis=1)
+    def _band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.rows; return [(i, sig[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+    def _near(self, sig: np.ndarray, nums: Tuple[str, ...], pool: Callable[[Tuple[int, bytes]], Sequence[int]], sigs, numbers) -> Optional[int]:
+        if self.threshold >= 1.0: return None
+        seen = set()
+        for key in self._band_keys(sig):
+            for j in pool(key):
+                if j in seen: continue
+                seen.add(j)
+                if numbers[j] == nums and float(np.mean(sigs[j] == sig)) >= self.threshold: return j
+        return None
+    def find(self, text: str) -> Optional[int]:
+        """Index of a committed step that `text` duplicates, if any."""
+        with self._lock: return self._find(text)
+    def _find(self, text: str) -> Optional[int]:
+        hit = self._exact.get(self._digest(text))
+        if hit is not None or self.threshold >= 1.0: return hit
+        return self._near(self._signature(text), tuple(_NUM.findall(text)), lambda key: self._buckets.get(key, ()), self._sigs, self._nums)
+    def groups(self, texts: Sequence[str]) -> List[int]:
+        """For each text, the index of the first exact or near-duplicate copy within `texts` (itself if first)."""
+        out: List[int] = []; exact: Dict[bytes, int] = {}; buckets: Dict[Tuple[int, bytes], List[int]] = {}; sigs: Dict[int, np.ndarray] = {}; nums: Dict[int, Tuple[str, ...]] = {}
+        for i, text in enumerate(texts):
+            d = self._digest(text); j = exact.get(d)
+            if j is None and self.threshold < 1.0:
+                sig = self._signature(text); n = tuple(_NUM.findall(text)); j = self._near(sig, n, lambda k: buckets.get(k, ()), sigs, nums)
+                if j is None:
+                    for k in self._band_keys(sig): buckets.setdefault(k, []).append(i)
+                    sigs[i] = sig; nums[i] = n
+            if j is None: exact[d] = j = i
+            out.append(j)
+        return out
+    def unique(self, items: Sequence[Any], key: Callable[[Any], str] = lambda x: x) -> List[Any]:
+        """First copy of every exact or near-duplicate group, in order."""
+        reps = self.groups([key(x) for x in items]); out = [x for i, x in enumerate(items) if reps[i] == i]
+        with self._lock: self.merged += len(items) - len(out)
+        return out
+    def score_batch(self, val_est, task: str, texts: Sequence[str], reps: Optional[List[int]] = None) -> List[Tuple[float, float, Dict[str, Any]]]:
+        """ValueEstimator.score_batch, scoring each distinct text once; reused scores carry no usage. `reps` may pass precomputed `groups(texts)`."""
+        out: List[Any] = [None] * len(texts); reps = reps if reps is not None else self.groups(texts); todo: List[int] = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                if reps[i] != i: continue
+                j = self._find(text)
+                if j is None: todo.append(i); continue
+                out[i] = (*self._scores[j], {"usage": {"prompt_tokens": 0, "completion_tokens": 0}, "dedup": True}); self.reused += 1
+        for i, res in zip(todo, val_est.score_batch(task, [texts[i] for i in todo]) if todo else []): out[i] = res
+        copies = 0
+        for i, j in enumerate(reps):
+            if j != i: out[i] = (out[j][0], out[j][1], {"usage": {"prompt_tokens": 0, "completion_tokens": 0}, "dedup": True}); copies += 1
+        with self._lock: self.reused += copies
+        return out
+    def commit(self, steps: Sequence[Tuple[str, float, float]]) -> None:
+        """Record scored (text, mu, sigma) steps so later levels reuse their scores."""
+        with self._lock:
+            for text, mu, sigma in steps:
+                d = self._digest(text)
+                if d in self._exact: continue
+                j = len(self._scores); self._exact[d] = j; self._scores.append((float(mu), float(sigma)))
+                sig = self._signature(text) if self.threshold < 1.0 else np.zeros(0, dtype=np.uint64); self._sigs.append(sig); self._nums.append(tuple(_NUM.findall(text)))
+                if self.threshold < 1.0:
+                    for k in self._band_keys(sig): self._buckets.setdefault(k, []).append(j)
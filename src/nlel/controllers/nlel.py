@@ -1,12 +1,16 @@
 from typing import List, Dict, Any, Tuple, Optional
-import json, re
+import contextvars, json, re
 from dataclasses import dataclass, field
 from ..models.base import TextModel
-from ..prompts import load_prompt
+from ..models.tracing import role_model, set_depth
+from ..prompts import get_template
 from ..schema import ControlVector, schema_validate_or_default, trust_region_project, quantize_controls
 from ..config import DEFAULT_P0, LEDGER_MAX_ROWS, MAX_DEPTH, MAX_TOTAL_EXPANSIONS, beta_at_depth
 from ..ledger.ledger import Ledger
-from .tot import tot_select, Candidate
+from .tot import Candidate, Node, intern_pi, tot_select
+from .anytime import record_level
+from .dedup import StepDeduper
+from .budget import BudgetGuard, LevelBudget
 from ..tokens import TokenBank
 from ..retrieval import retrieval_context
 from ..eval.evaluator import ValueEstimator
@@ -36,20 +40,59 @@ class Labeller:
         if self.random_labels:
             import random; labs = random.sample(self._pool, k=min(self.max_labels, len(self._pool)))
             return (labs, {"usage":{"prompt_tokens":0,"completion_tokens":0}})
-        resp, meta = self.model.generate(load_prompt("labeller.txt").format(parent=parent[:1000], context_json=ctx.to_json(), max_labels=self.max_labels), temperature=0.3, top_p=0.9, max_tokens=64)
+        resp, meta = self.model.generate(self._prompt(parent, ctx), temperature=0.3, top_p=0.9, max_tokens=64)
+        return self._labels(resp), meta
+    def emit_labels_many(self, parents: List[str], ctx: Context) -> List[Tuple[List[str], Dict[str, Any]]]:
+        """Labels for every frontier node in a single batch call."""
+        if self.frozen or self.random_labels or len(parents) < 2: return [self.emit_labels(p, ctx) for p in parents]
+        gens = self.model.batch_generate([self._prompt(p, ctx) for p in parents], temperature=0.3, top_p=0.9, max_tokens=64)
+        return [(self._labels(resp), meta) for resp, meta in gens]
+    def _prompt(self, parent: str, ctx: Context) -> str:
+        return get_template("labeller.txt").format(parent=parent[:1000], context_json=ctx.to_json(), max_labels=self.max_labels)
+    def _labels(self, resp: str) -> List[str]:
         labels = [s.strip() for s in re.split(r"[;\n]", resp) if s.strip()]
-        labels = list(dict.fromkeys(labels))[: self.max_labels] or ["default"]
-        return labels, meta
+        return list(dict.fromkeys(labels))[: self.max_labels] or ["default"]
+
+def context_signature(ctx: Context, buckets: int = 8) -> Tuple:
+    """Coarse view of a Context for cache keys: depth, medians to one decimal, token use in 1/buckets of budget."""
+    used = int(buckets * ctx.tokens_used / max(1, ctx.tokens_budget))
+    return (ctx.depth, round(ctx.frontier_sigma_median, 1), round(ctx.novelty_median, 1), round(ctx.siblings_best_mu, 1), round(ctx.siblings_best_sigma, 1), used)
+
+class ControlCache:
+    """
+    LRU of control vectors keyed by (label, context_signature). An entry is stale once the ledger has had
+    more than `max_stale` rows added since it was stored (the tuner would be prompted with different
+    outcomes by then); max_stale=0 invalidates on any ledger change.
+    """
+    def __init__(self, max_entries: int = 128, max_stale: int = 4):
+        from collections import OrderedDict
+        import threading
+        self.max_entries = max_entries; self.max_stale = max_stale
+        self._entries: "OrderedDict[Tuple, Tuple[ControlVector, int]]" = OrderedDict(); self._lock = threading.Lock()
+        self.hits = 0; self.misses = 0
+    def get(self, key: Tuple, version: int) -> Optional[ControlVector]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or version - hit[1] > self.max_stale:
+                if hit is not None: del self._entries[key]
+                self.misses += 1; return None
+            self._entries.move_to_end(key); self.hits += 1
+            return hit[0]
+    def put(self, key: Tuple, cv: ControlVector, version: int) -> None:
+        with self._lock:
+            self._entries[key] = (cv, version); self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
 
 class TunerJPE:
-    def __init__(self, model: TextModel, trust_region_r: float = 0.15, no_trust_region: bool = False, quantize_bits: int = 0, frozen: bool = False):
+    """cache_size > 0 memoizes control vectors per (label, context signature); see ControlCache."""
+    def __init__(self, model: TextModel, trust_region_r: float = 0.15, no_trust_region: bool = False, quantize_bits: int = 0, frozen: bool = False, cache_size: int = 0, cache_max_stale: int = 4):
         self.model = model; self.r = trust_region_r; self.no_trust_region = no_trust_region; self.quantize_bits = quantize_bits; self.frozen = frozen
         self.ledger = Ledger(max_rows=LEDGER_MAX_ROWS)
-    def emit_controls(self, parent: str, label: str, ctx: Context):
-        if self.frozen: return (ControlVector(**DEFAULT_P0), {"usage":{"prompt_tokens":0,"completion_tokens":0}})
+        self.cache = ControlCache(cache_size, cache_max_stale) if cache_size > 0 else None
+    def _prompt(self, parent: str, label: str, ctx: Context) -> str:
         p0 = json.dumps(DEFAULT_P0, ensure_ascii=False); ledger_block = self.ledger.render_block()
-        prompt = load_prompt("tuner_jpe.txt").format(p0_json=p0, ledger_block=ledger_block, parent=parent[:1000], label=label, context_json=ctx.to_json())
-        resp, meta = self.model.generate(prompt, temperature=0.0, top_p=1.0, max_tokens=256)
+        return get_template("tuner_jpe.txt").format(p0_json=p0, ledger_block=ledger_block, parent=parent[:1000], label=label, context_json=ctx.to_json())
+    def _controls(self, resp: str) -> ControlVector:
         try:
             start = resp.find('{'); end = resp.rfind('}'); obj = json.loads(resp[start:end+1])
         except Exception:
@@ -57,52 +100,230 @@ class TunerJPE:
         cv = schema_validate_or_default(obj, DEFAULT_P0)
         if not self.no_trust_region: cv = trust_region_project(cv, r=self.r, p0=DEFAULT_P0)
         if self.quantize_bits and self.quantize_bits>0: cv = quantize_controls(cv, bits=self.quantize_bits)
-        return cv, meta
+        return cv
+    def _cached(self, label: str, ctx: Context) -> Optional[Tuple[ControlVector, Dict[str, Any]]]:
+        if self.cache is None: return None
+        cv = self.cache.get((label, context_signature(ctx)), self.ledger.version)
+        return (cv, {"usage":{"prompt_tokens":0,"completion_tokens":0}, "cache_hit": True}) if cv is not None else None
+    def _store(self, label: str, ctx: Context, cv: ControlVector) -> ControlVector:
+        if self.cache is not None: self.cache.put((label, context_signature(ctx)), cv, self.ledger.version)
+        return cv
+    def emit_controls(self, parent: str, label: str, ctx: Context):
+        if self.frozen: return (ControlVector(**DEFAULT_P0), {"usage":{"prompt_tokens":0,"completion_tokens":0}})
+        hit = self._cached(label, ctx)
+        if hit is not None: return hit
+        resp, meta = self.model.generate(self._prompt(parent, label, ctx), temperature=0.0, top_p=1.0, max_tokens=256)
+        return self._store(label, ctx, self._controls(resp)), meta
+    def emit_controls_many(self, pairs: List[Tuple[str, str]], ctx: Context) -> List[Tuple[ControlVector, Dict[str, Any]]]:
+        """Controls for several (parent, label) pairs in a single batch call (all see the same ledger)."""
+        if self.frozen or not pairs: return [self.emit_controls(parent, L, ctx) for parent, L in pairs]
+        out: List[Any] = [self._cached(L, ctx) for _, L in pairs]
+        # With the cache on, pairs sharing a label share one key and one tuner call (the first pair's prompt).
+        key = (lambda i, L: L) if self.cache is not None else (lambda i, L: i)
+        todo: Dict[Any, int] = {}
+        for i, (_, L) in enumerate(pairs):
+            if out[i] is None: todo.setdefault(key(i, L), i)
+        if todo:
+            gens = self.model.batch_generate([self._prompt(*pairs[i], ctx) for i in todo.values()], temperature=0.0, top_p=1.0, max_tokens=256)
+            for i, (resp, meta) in zip(todo.values(), gens): out[i] = (self._store(pairs[i][1], ctx, self._controls(resp)), meta)
+        for i, (_, L) in enumerate(pairs):
+            if out[i] is None: out[i] = (out[todo[key(i, L)]][0], {"usage":{"prompt_tokens":0,"completion_tokens":0}, "cache_hit": True})
+        return out
+
+class FusedLabellerTuner:
+    """
+    Labeller and tuner in one call per parent: the model returns a JSON array of {"label", "controls"}
+    entries, each control vector validated and trust-region projected like TunerJPE's. Stands in for both
+    roles in run_instance: emit_labels/emit_labels_many make the call and keep the controls of the level,
+    which emit_controls/emit_controls_many then return without further model calls.
+    """
+    def __init__(self, model: TextModel, max_labels: int = 3, trust_region_r: float = 0.15, no_trust_region: bool = False, quantize_bits: int = 0):
+        self.model = model; self.max_labels = max_labels; self.r = trust_region_r; self.no_trust_region = no_trust_region; self.quantize_bits = quantize_bits
+        self.ledger = Ledger(max_rows=LEDGER_MAX_ROWS); self._controls_of: Dict[Tuple[str, str], ControlVector] = {}
+    def _prompt(self, parent: str, ctx: Context) -> str:
+        return get_template("labeller_tuner.txt").format(p0_json=json.dumps(DEFAULT_P0, ensure_ascii=False), ledger_block=self.ledger.render_block(),
+                                                        parent=parent[:1000], context_json=ctx.to_json(), max_labels=self.max_labels)
+    def _plan(self, resp: str) -> List[Tuple[str, ControlVector]]:
+        try:
+            start = resp.find('['); end = resp.rfind(']'); entries = json.loads(resp[start:end+1])
+        except Exception:
+            entries = []
+        plan: Dict[str, ControlVector] = {}
+        for e in entries if isinstance(entries, list) else []:
+            if not isinstance(e, dict): continue
+            label = str(e.get("label") or "").strip()
+            if not label or label in plan: continue
+            cv = schema_validate_or_default(e.get("controls") if isinstance(e.get("controls"), dict) else DEFAULT_P0, DEFAULT_P0)
+            if not self.no_trust_region: cv = trust_region_project(cv, r=self.r, p0=DEFAULT_P0)
+            if self.quantize_bits and self.quantize_bits>0: cv = quantize_controls(cv, bits=self.quantize_bits)
+            plan[label] = cv
+            if len(plan) >= self.max_labels: break
+        return list(plan.items()) or [("default", ControlVector(**DEFAULT_P0))]
+    def emit_labels_many(self, parents: List[str], ctx: Context) -> List[Tuple[List[str], Dict[str, Any]]]:
+        gens = self.model.batch_generate([self._prompt(p, ctx) for p in parents], temperature=0.3, top_p=0.9, max_tokens=128 + 192 * self.max_labels)
+        self._controls_of = {}; out = []
+        for parent, (resp, meta) in zip(parents, gens):
+            plan = self._plan(resp)
+            for label, cv in plan: self._controls_of[(parent, label)] = cv
+            out.append(([label for label, _ in plan], meta))
+        return out
+    def emit_labels(self, parent: str, ctx: Context):
+        return self.emit_labels_many([parent], ctx)[0]
+    def emit_controls(self, parent: str, label: str, ctx: Context):
+        cv = self._controls_of.get((parent, label)) or ControlVector(**DEFAULT_P0)
+        return cv, {"usage":{"prompt_tokens":0,"completion_tokens":0}}
+    def emit_controls_many(self, pairs: List[Tuple[str, str]], ctx: Context) -> List[Tuple[ControlVector, Dict[str, Any]]]:
+        return [self.emit_controls(parent, L, ctx) for parent, L in pairs]
 
-def _expand_under_label(task: str, parent: str, label: str, ctx: Context, tuner: TunerJPE, reasoner: TextModel, val_est: ValueEstimator):
-    cv, meta_tuner = tuner.emit_controls(parent, label, ctx)
+LABEL_CONCURRENCY = ("serial", "threads", "batch", "auto")
+
+def _label_prompts(task: str, parent: str, label: str, ctx: Context, cv: ControlVector) -> List[str]:
     rctx = retrieval_context(cv.retrieval_weights or {}, novelty=float(ctx.novelty_median))
     prompts = []
     for _ in range(int(cv.gen_count)):
         chunk = f"\n\nRetrieved context:\n{rctx}" if rctx else ""
         prompts.append(f"Task:\n{task}\n\nParent step:\n{parent}{chunk}\n\nDirective: {label}\n\nContinue the reasoning. If you can conclude, write 'Final Answer: <answer>'.")
-    gens = reasoner.batch_generate(prompts, temperature=cv.temperature, top_p=cv.top_p, max_tokens=cv.max_tokens, repetition_penalty=cv.repetition_penalty)
+    return prompts
+
+def _decode_kwargs(cv: ControlVector) -> Dict[str, Any]:
+    return dict(temperature=cv.temperature, top_p=cv.top_p, max_tokens=cv.max_tokens, repetition_penalty=cv.repetition_penalty, stop_on_final_answer=True)
+
+def _build_children(label: str, ctx: Context, cv: ControlVector, gens, scores):
     children = []; usage_total = {"prompt_tokens":0,"completion_tokens":0}
-    for text, meta in gens:
-        mu, sigma, meta_val = val_est.score(task, text); beta_eff = beta_at_depth(ctx.depth, base_beta=float(cv.beta))
-        score = mu + beta_eff * sigma
-        cand = Candidate(text=text, mu=mu, sigma=sigma, score=score, usage=meta, label=label,
-                 pi={**cv.model_dump(), 'beta': float(beta_eff)})
+    beta_eff = beta_at_depth(ctx.depth, base_beta=float(cv.beta)); pi = intern_pi({**cv.model_dump(), 'beta': float(beta_eff)})
+    for (text, meta), (mu, sigma, meta_val) in zip(gens, scores):
+        cand = Candidate(text=text, mu=mu, sigma=sigma, score=mu + beta_eff * sigma, usage=meta, label=label, pi=pi)
         children.append(cand)
         for m in (meta, meta_val):
             u = m.get("usage", {}); usage_total["prompt_tokens"] += int(u.get("prompt_tokens",0)); usage_total["completion_tokens"] += int(u.get("completion_tokens",0))
-    if children:
-        tuner.ledger.add({"L": label, "Pi": cv.model_dump(), "mu": float(sum(c.mu for c in children)/len(children)), "sigma": float(sum(c.sigma for c in children)/len(children)), "accept": None, "cost": usage_total})
+    return children, usage_total
+
+def _ledger_row(label: str, cv: ControlVector, children, usage_total) -> Dict[str, Any]:
+    return {"L": label, "Pi": cv.model_dump(), "mu": float(sum(c.mu for c in children)/len(children)), "sigma": float(sum(c.sigma for c in children)/len(children)), "accept": None, "cost": usage_total}
+
+def _score(task: str, gens, val_est: ValueEstimator, dedup: Optional[StepDeduper]):
+    texts = [text for text, _ in gens]
+    return dedup.score_batch(val_est, task, texts) if dedup is not None else val_est.score_batch(task, texts)
+
+def _guarded(guard: Optional[BudgetGuard], remaining: Optional[int], cv: ControlVector, prompts: List[str], level: Optional[LevelBudget] = None, turn: int = 0) -> Tuple[ControlVector, List[str]]:
+    """
+    Controls and prompts trimmed to what the guard predicts fits in `remaining` tokens, or in the share of
+    `level` left for `turn` when given (no prompts = skip).
+    """
+    if level is not None: rows, max_tokens = level.take(turn, prompts, int(cv.max_tokens))
+    elif guard is None or remaining is None: return cv, prompts
+    else: rows, max_tokens = guard.fit(prompts, int(cv.max_tokens), remaining)
+    if rows == len(prompts) and max_tokens == int(cv.max_tokens): return cv, prompts
+    return cv.model_copy(update={"gen_count": max(1, rows), "max_tokens": max(1, max_tokens)}), prompts[:rows]
+
+def _generate_under_label(task: str, parent: str, label: str, ctx: Context, tuner: TunerJPE, reasoner: TextModel, guard: Optional[BudgetGuard] = None, remaining: Optional[int] = None, level: Optional[LevelBudget] = None, turn: int = 0):
+    """Controls (after the guard's trimming) and generated steps of one (parent, label) pair; no steps = skipped."""
+    try:
+        cv, meta_tuner = tuner.emit_controls(parent, label, ctx)
+        cv, prompts = _guarded(guard, remaining, cv, _label_prompts(task, parent, label, ctx, cv), level, turn)
+    finally:
+        if level is not None: level.release(turn)
+    return cv, reasoner.batch_generate(prompts, **_decode_kwargs(cv)) if prompts else []
+
+def _expand_under_label(task: str, parent: str, label: str, ctx: Context, tuner: TunerJPE, reasoner: TextModel, val_est: ValueEstimator, record: bool = True, dedup: Optional[StepDeduper] = None, guard: Optional[BudgetGuard] = None, remaining: Optional[int] = None):
+    cv, gens = _generate_under_label(task, parent, label, ctx, tuner, reasoner, guard, remaining)
+    if not gens: return [], {"prompt_tokens": 0, "completion_tokens": 0}, cv
+    children, usage_total = _build_children(label, ctx, cv, gens, _score(task, gens, val_est, dedup))
+    if children and record:
+        tuner.ledger.add(_ledger_row(label, cv, children, usage_total))
     return children, usage_total, cv
 
-def run_instance(task: str, gold_answer: Optional[str], model: TextModel, budget_tokens: int = 8000, labeller: Labeller=None, tuner: TunerJPE=None, verifier=None, ignore_verifier_control: bool=False):
-    ctx = Context(depth=0, tokens_budget=budget_tokens); parent_text = ""; from ..tokens import TokenBank; tb = TokenBank()
+def _expand_labels_concurrent(task: str, pairs: List[Tuple[str, str]], ctx: Context, tuner: TunerJPE, reasoner: TextModel, val_est: ValueEstimator, mode: str, dedup: Optional[StepDeduper] = None, guard: Optional[BudgetGuard] = None, remaining: Optional[int] = None):
+    """
+    Expand every (parent, label) pair of a frontier level at once. "threads" runs tuner call and generation
+    of each pair in a pool (remote backends: level latency is the slowest pair); "batch" issues one tuner
+    batch and one merged `generate_many` over all pairs' prompts (local backends). Either way the level's
+    steps are then scored in one `score_batch`, so duplicates across pairs are scored once and both modes
+    charge the same tokens. Tuner calls of a level all see the ledger as of the level start; ledger rows
+    are appended afterwards in pair order. With a guard, both hand the `remaining` budget to pairs in pair
+    order through a LevelBudget; in "threads" a pair's generation waits until the earlier pairs' controls
+    are known.
+    """
+    level = LevelBudget(guard, remaining) if guard is not None and remaining is not None else None
+    if mode == "threads":
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, len(pairs))) as pool:
+            # Each task runs in a copy of the caller's context so per-call tags (models.tracing depth) carry over.
+            futures = [pool.submit(contextvars.copy_context().run, _generate_under_label, task, parent, L, ctx, tuner, reasoner, level=level, turn=i) for i, (parent, L) in enumerate(pairs)]
+            generated = [f.result() for f in futures]
+        cvs = [cv for cv, _ in generated]; gens = []; spans = []
+        for _, g in generated: spans.append((len(gens), len(gens) + len(g))); gens.extend(g)
+    else:
+        cvs = [cv for cv, _ in tuner.emit_controls_many(pairs, ctx)]
+        requests = []; spans = []
+        for i, ((parent, L), cv) in enumerate(zip(pairs, cvs)):
+            cv, prompts = _guarded(guard, remaining, cv, _label_prompts(task, parent, L, ctx, cv), level, i); kw = _decode_kwargs(cv); cvs[i] = cv
+            spans.append((len(requests), len(requests) + len(prompts))); requests.extend((p, kw) for p in prompts)
+        gens = reasoner.generate_many(requests) if requests else []
+    scores = _score(task, gens, val_est, dedup) if gens else []
+    results = []
+    for (_, L), cv, (a, b) in zip(pairs, cvs, spans):
+        children, usage_total = _build_children(L, ctx, cv, gens[a:b], scores[a:b])
+        results.append((children, usage_total, cv))
+    for (_, L), (children, usage_total, cv) in zip(pairs, results):
+        if children: tuner.ledger.add(_ledger_row(L, cv, children, usage_total))
+    return results
+
+def run_instance(task: str, gold_answer: Optional[str], model: TextModel, budget_tokens: int = 8000, labeller: Labeller=None, tuner: TunerJPE=None, verifier=None, ignore_verifier_control: bool=False, label_concurrency: str = "serial", trace: Optional[List[Dict[str, Any]]] = None, frontier_width: Optional[int] = None, dedup: bool = True, budget_guard: bool = True):
+    """
+    Level-synchronous search over a frontier of nodes: each level labels every frontier node, expands every
+    (node, label) pair, and keeps the best max(branch_quota) children; up to `frontier_width` of them
+    (default: all survivors) form the next frontier. frontier_width=1 is the single-parent greedy chain.
+    trace: if given, one entry per tree level with cumulative tokens (see controllers.anytime).
+    labeller/tuner: pass the same FusedLabellerTuner as both to get labels and controls from one call per node.
+    label_concurrency: "serial" expands pairs one by one and stops mid-level once the budget is spent;
+    "threads" / "batch" expand all pairs of a level together (see `_expand_labels_concurrent`) and check
+    the budget at level boundaries; "auto" picks "batch" for backends with native batching, else "threads".
+    dedup: reuse the scores of steps seen at earlier levels and merge duplicate children of a level, keeping
+    the first in (node, label) order (see controllers.dedup).
+    budget_guard: before each expansion, trim gen_count/max_tokens or skip it when its predicted cost would
+    exceed the remaining budget (see controllers.budget).
+    """
+    if label_concurrency not in LABEL_CONCURRENCY: raise ValueError(f"Unsupported label_concurrency: {label_concurrency}")
+    if label_concurrency == "auto": label_concurrency = "batch" if getattr(model, "native_batch", False) else "threads"
+    ctx = Context(depth=0, tokens_budget=budget_tokens); frontier = [Node()]; tb = TokenBank()
     from ..eval.evaluator import ExactMatchChecker
-    val_est = ValueEstimator(model=model)
+    val_est = ValueEstimator(model=role_model(model, "evaluator")); dd = StepDeduper() if dedup else None
+    guard = BudgetGuard(budget_tokens, model.token_counter(), task, evaluator_max_tokens=val_est.max_tokens) if budget_guard else None
     total_exp = 0; best_leaf = None
     while total_exp < MAX_TOTAL_EXPANSIONS and ctx.depth < MAX_DEPTH and tb.total < budget_tokens:
-        labels, meta_lab = labeller.emit_labels(parent_text, ctx) if labeller else (["default"], {"usage":{"prompt_tokens":0,"completion_tokens":0}})
-        all_cands = []; usage_acc = {"prompt_tokens":0,"completion_tokens":0}; branch_quotas = []
-        for L in labels:
-            kids, usage, cv = _expand_under_label(task, parent_text, L, ctx, tuner, model, val_est)
-            all_cands.extend(kids); branch_quotas.append(int(cv.branch_quota))
+        set_depth(ctx.depth)
+        if labeller:
+            labelled = labeller.emit_labels_many([node.text for node in frontier], ctx)
+        else:
+            labelled = [(["default"], {"usage":{"prompt_tokens":0,"completion_tokens":0}}) for _ in frontier]
+        owners = [(node, L) for node, (labels, _) in zip(frontier, labelled) for L in labels]
+        pairs = [(node.text, L) for node, L in owners]
+        children = []; usage_acc = {"prompt_tokens":0,"completion_tokens":0}; branch_quotas = []
+        if label_concurrency == "serial" or len(pairs) < 2:
+            expanded = (_expand_under_label(task, parent, L, ctx, tuner, model, val_est, dedup=dd, guard=guard,
+                                            remaining=guard.remaining(tb.total + usage_acc["prompt_tokens"] + usage_acc["completion_tokens"]) if guard else None) for parent, L in pairs)
+        else:
+            expanded = _expand_labels_concurrent(task, pairs, ctx, tuner, model, val_est, label_concurrency, dedup=dd, guard=guard, remaining=guard.remaining(tb.total) if guard else None)
+        for (node, _), (kids, usage, cv) in zip(owners, expanded):
+            children.extend(node.child(c) for c in kids); branch_quotas.append(int(cv.branch_quota))
+            if guard is not None: guard.observe([c.usage for c in kids])
             usage_acc["prompt_tokens"] += usage["prompt_tokens"]; usage_acc["completion_tokens"] += usage["completion_tokens"]
             total_exp += len(kids)
-            if tb.total + usage_acc["prompt_tokens"] + usage_acc["completion_tokens"] >= budget_tokens: break
+            if label_concurrency == "serial" and tb.total + usage_acc["prompt_tokens"] + usage_acc["completion_tokens"] >= budget_tokens: break
         tb.add(**usage_acc)
-        if not all_cands: break
-        k_eff = max(branch_quotas) if branch_quotas else 1
-        survivors = tot_select(all_cands, k=k_eff)
-        for cand in survivors:
-            if "Final Answer:" in cand.text:
-                best_leaf = cand; break
+        if dd is not None:
+            dd.commit([(n.text, n.cand.mu, n.cand.sigma) for n in children]); children = dd.unique(children, key=lambda n: n.text)
+        if not children:
+            record_level(trace, ctx.depth, tb.total, total_exp, False); break
+        survivors = tot_select(children, max(branch_quotas) if branch_quotas else 1)
+        for node in survivors:
+            if "Final Answer:" in node.text:
+                best_leaf = node.cand; break
+        record_level(trace, ctx.depth, tb.total, total_exp, best_leaf is not None)
         if best_leaf is not None or tb.total >= budget_tokens: break
-        parent_text = survivors[0].text; ctx.depth += 1; ctx.label_history.extend([c.label for c in survivors])
+        frontier = survivors[:frontier_width] if frontier_width else survivors
+        ctx.depth += 1; ctx.label_history.extend([node.cand.label for node in survivors])
     verified = None
     if best_leaf and verifier:
         if ignore_verifier_control:
@@ -1,13 +1,92 @@
-from typing import List, Dict, Any
-from dataclasses import dataclass, field
-@dataclass
+from typing import List, Dict, Any, Optional
+from array import array
+from collections import OrderedDict
+import heapq, json, threading
+
+_PI_TABLE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # canonical JSON -> interned dict, least recently used first
+_PI_KEYS: Dict[int, str] = {}  # id of an interned dict -> its key (the table keeps the dict alive, so ids are not reused)
+_PI_TABLE_MAX = 4096
+_PI_LOCK = threading.Lock()
+
+def intern_pi(pi: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Canonical shared copy of a control-vector dict, so siblings generated under the same controls hold one
+    dict between them. Interned dicts are shared: treat them as read-only. Passing an interned dict back is
+    an identity lookup; only new dicts are serialized. Past _PI_TABLE_MAX entries the least recently used go.
+    """
+    if not pi: return {}
+    with _PI_LOCK:
+        key = _PI_KEYS.get(id(pi))
+        if key is not None and _PI_TABLE.get(key) is pi:
+            _PI_TABLE.move_to_end(key); return pi
+    key = json.dumps(pi, sort_keys=True, default=str)
+    with _PI_LOCK:
+        hit = _PI_TABLE.get(key)
+        if hit is None:
+            hit = _PI_TABLE[key] = dict(pi); _PI_KEYS[id(hit)] = key
+            while len(_PI_TABLE) > _PI_TABLE_MAX:
+                _, old = _PI_TABLE.popitem(last=False); del _PI_KEYS[id(old)]
+        else:
+            _PI_TABLE.move_to_end(key)
+    return hit
+
 class Candidate:
-    text: str
-    mu: float
-    sigma: float
-    score: float
-    usage: Dict[str, Any] = field(default_factory=dict)
-    label: str = ""
-    pi: Dict[str, Any] = field(default_factory=dict)
+    """A scored step. `pi` is stored as given: callers intern it once per control setting (see intern_pi)."""
+    __slots__ = ("text", "mu", "sigma", "score", "usage", "label", "pi")
+    def __init__(self, text: str, mu: float, sigma: float, score: float, usage: Optional[Dict[str, Any]] = None, label: str = "", pi: Optional[Dict[str, Any]] = None):
+        self.text = text; self.mu = mu; self.sigma = sigma; self.score = score
+        self.usage = usage if usage is not None else {}; self.label = label; self.pi = pi if pi is not None else {}
+    def __repr__(self) -> str:
+        return f"Candidate(text={self.text!r}, mu={self.mu!r}, sigma={self.sigma!r}, score={self.score!r}, label={self.label!r})"
+
 def tot_select(cands: List[Candidate], k: int) -> List[Candidate]:
-    return sorted(cands, key=lambda c: c.score, reverse=True)[:k]
+    # nlargest keeps the stable order of sorted(..., reverse=True)[:k] without sorting the whole list.
+    if k >= len(cands): return sorted(cands, key=lambda c: c.score, reverse=True)
+    return heapq.nlargest(k, cands, key=lambda c: c.score)
+
+class Node:
+    """A search-tree node: the candidate step plus parent pointer and depth."""
+    __slots__ = ("cand", "parent", "depth")
+    def __init__(self, cand: Optional[Candidate] = None, parent: Optional["Node"] = None, depth: int = 0):
+        self.cand = cand; self.parent = parent; self.depth = depth  # cand is None for the root (empty parent step)
+    @property
+    def text(self) -> str:
+        return self.cand.text if self.cand is not None else ""
+    @property
+    def score(self) -> float:
+        return self.cand.score if self.cand is not None else 0.0
+    def child(self, cand: Candidate) -> "Node":
+        return Node(cand=cand, parent=self, depth=self.depth + 1)
+
+class CandidateStore:
+    """
+    Array-backed buffer for one level's children: scores live in flat arrays, texts, labels and controls are
+    referenced by index (labels are interned; `pi` dicts are shared by identity, so pass one dict per control
+    setting, e.g. from `intern_pi`), and Candidate/Node objects are only built for the rows that survive selection.
+    """
+    __slots__ = ("texts", "usage", "owners", "mu", "sigma", "score", "label_ids", "pi_ids", "_labels", "_label_idx", "_pis", "_pi_idx")
+    def __init__(self):
+        self.texts: List[str] = []; self.usage: List[Dict[str, Any]] = []; self.owners: List[Optional[Node]] = []
+        self.mu = array("d"); self.sigma = array("d"); self.score = array("d")
+        self.label_ids = array("i"); self.pi_ids = array("i")
+        self._labels: List[str] = []; self._label_idx: Dict[str, int] = {}
+        self._pis: List[Dict[str, Any]] = []; self._pi_idx: Dict[int, int] = {}
+    def add(self, text: str, mu: float, sigma: float, score: float, usage: Optional[Dict[str, Any]] = None, label: str = "", pi: Optional[Dict[str, Any]] = None, owner: Optional[Node] = None) -> int:
+        lid = self._label_idx.get(label)
+        if lid is None: lid = self._label_idx[label] = len(self._labels); self._labels.append(label)
+        pi = pi if pi is not None else {}; pid = self._pi_idx.get(id(pi))
+        if pid is None: pid = self._pi_idx[id(pi)] = len(self._pis); self._pis.append(pi)
+        self.texts.append(text); self.usage.append(usage if usage is not None else {}); self.owners.append(owner)
+        self.mu.append(float(mu)); self.sigma.append(float(sigma)); self.score.append(float(score))
+        self.label_ids.append(lid); self.pi_ids.append(pid)
+        return len(self.texts) - 1
+    def __len__(self) -> int:
+        return len(self.texts)
+    def top(self, k: int) -> List[int]:
+        """Indices of the k best rows by score, best first (ties keep insertion order)."""
+        return heapq.nlargest(k, range(len(self.texts)), key=self.score.__getitem__)
+    def candidate(self, i: int) -> Candidate:
+        return Candidate(text=self.texts[i], mu=self.mu[i], sigma=self.sigma[i], score=self.score[i], usage=self.usage[i],
+                         label=self._labels[self.label_ids[i]], pi=self._pis[self.pi_ids[i]])
+    def node(self, i: int) -> Node:
+        owner = self.owners[i] or Node(); return owner.child(self.candidate(i))
@@ -1,10 +1,14 @@
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 from ..models.base import TextModel
+from ..models.tracing import role_model, set_depth
 from ..eval.evaluator import ValueEstimator, ExactMatchChecker
 from ..tokens import TokenBank
 from ..config import DEFAULT_P_TOT, MAX_DEPTH, MAX_TOTAL_EXPANSIONS, beta_at_depth
-from .tot import Candidate, tot_select
+from .tot import Node, CandidateStore, intern_pi
+from .anytime import record_level
+from .dedup import StepDeduper
+from .budget import BudgetGuard
 @dataclass
 class ToTParams:
     temperature: float = float(DEFAULT_P_TOT["temperature"])
@@ -14,23 +18,52 @@ class ToTParams:
     gen_count: int = int(DEFAULT_P_TOT["gen_count"])
     branch_quota: int = int(DEFAULT_P_TOT["branch_quota"])
     beta: float = float(DEFAULT_P_TOT["beta"])
-def run_tot(task: str, model: TextModel, gold_answer: Optional[str] = None, params: ToTParams = ToTParams(), with_verifier=False, verifier=None, verifier_passes=1, verifier_strictness=0.5, budget_tokens: int = 8000) -> Dict[str, Any]:
-    tb = TokenBank(); ve = ValueEstimator(model=model); depth = 0; parent = ""; expansions = 0; best_leaf = None
+def run_tot(task: str, model: TextModel, gold_answer: Optional[str] = None, params: ToTParams = ToTParams(), with_verifier=False, verifier=None, verifier_passes=1, verifier_strictness=0.5, budget_tokens: int = 8000, trace: Optional[List[Dict[str, Any]]] = None, frontier_width: Optional[int] = None, dedup: bool = True, budget_guard: bool = True) -> Dict[str, Any]:
+    """
+    Level-synchronous ToT: every node on the frontier gets `gen_count` children from one batched generation
+    call and one batched scoring call; the best `branch_quota` children survive and, up to `frontier_width`
+    (default: all survivors), form the next frontier. frontier_width=1 is the single-parent greedy chain.
+    dedup: score each distinct step once per tree (see controllers.dedup) and merge duplicates within a level.
+    budget_guard: drop the children of the weakest frontier nodes, or shorten the step, when a level's
+    predicted cost exceeds the remaining budget (see controllers.budget).
+    """
+    tb = TokenBank(); ve = ValueEstimator(model=role_model(model, "evaluator")); dd = StepDeduper() if dedup else None; depth = 0; expansions = 0; best_leaf = None
+    guard = BudgetGuard(budget_tokens, model.token_counter(), task, evaluator_max_tokens=ve.max_tokens) if budget_guard else None
+    frontier = [Node()]; pi = intern_pi(DEFAULT_P_TOT)
     while expansions < MAX_TOTAL_EXPANSIONS and depth < MAX_DEPTH and tb.total < budget_tokens:
-        prompts = [f"Task:\n{task}\n\nParent step:\n{parent}\n\nDirective: default\n\nContinue reasoning. End with 'Final Answer: <answer>' if possible." for _ in range(params.gen_count)]
-        gens = model.batch_generate(prompts, temperature=params.temperature, top_p=params.top_p, max_tokens=params.max_tokens, repetition_penalty=params.repetition_penalty)
-        cands: List[Candidate] = []; usage = {"prompt_tokens":0,"completion_tokens":0}
-        for text, meta in gens:
-            mu, sigma, meta_val = ve.score(task, text); cands.append(Candidate(text=text, mu=mu, sigma=sigma, score=mu + beta_at_depth(depth, base_beta=params.beta) * sigma, usage=meta, label="default", pi=dict(DEFAULT_P_TOT)))
+        set_depth(depth)
+        owners = [node for node in frontier for _ in range(params.gen_count)]
+        prompts = [f"Task:\n{task}\n\nParent step:\n{node.text}\n\nDirective: default\n\nContinue reasoning. End with 'Final Answer: <answer>' if possible." for node in owners]
+        max_tokens = params.max_tokens
+        if guard is not None:
+            rows, max_tokens = guard.fit(prompts, max_tokens, guard.remaining(tb.total)); owners = owners[:rows]; prompts = prompts[:rows]
+            if not prompts:
+                record_level(trace, depth, tb.total, expansions, False); break
+        gens = model.batch_generate(prompts, temperature=params.temperature, top_p=params.top_p, max_tokens=max_tokens, repetition_penalty=params.repetition_penalty, stop_on_final_answer=True)
+        if guard is not None: guard.observe([meta for _, meta in gens])
+        children = CandidateStore(); usage = {"prompt_tokens":0,"completion_tokens":0}
+        texts = [text for text, _ in gens]; keep = range(len(gens))
+        if dd is not None:
+            reps = dd.groups(texts); keep = [i for i, j in enumerate(reps) if i == j]; dd.merged += len(gens) - len(keep)
+            scores = dd.score_batch(ve, task, texts, reps)
+        else:
+            scores = ve.score_batch(task, texts)
+        beta = beta_at_depth(depth, base_beta=params.beta)
+        for i in keep:
+            owner, (text, meta), (mu, sigma, meta_val) = owners[i], gens[i], scores[i]
+            children.add(text, mu, sigma, mu + beta * sigma, usage=meta, label="default", pi=pi, owner=owner)
+        for (_, meta), (_, _, meta_val) in zip(gens, scores):
             for m in (meta, meta_val):
                 u = m.get("usage", {}); usage["prompt_tokens"] += int(u.get("prompt_tokens",0)); usage["completion_tokens"] += int(u.get("completion_tokens",0))
-        tb.add(**usage); expansions += len(cands)
-        survivors = tot_select(cands, k=params.branch_quota)
-        for cand in survivors:
-            if "Final Answer:" in cand.text:
-                best_leaf = cand; break
-        if best_leaf is not None or tb.total >= budget_tokens: break
-        parent = survivors[0].text; depth += 1
+        tb.add(**usage); expansions += len(gens)
+        survivors = [children.node(i) for i in children.top(params.branch_quota)]
+        if dd is not None: dd.commit([(children.texts[i], children.mu[i], children.sigma[i]) for i in range(len(children))])
+        for node in survivors:
+            if "Final Answer:" in node.text:
+                best_leaf = node.cand; break
+        record_level(trace, depth, tb.total, expansions, best_leaf is not None)
+        if best_leaf is not None or tb.total >= budget_tokens or not survivors: break
+        frontier = survivors[:frontier_width] if frontier_width else survivors; depth += 1
     verified = None
     if best_leaf and with_verifier and verifier is not None:
         ok, meta_v = verifier.verify(task, best_leaf.text, passes=verifier_passes, strictness=verifier_strictness); tb.add(**meta_v.get("usage", {})); verified = ok
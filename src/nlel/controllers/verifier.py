@@ -1,16 +1,57 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
+import math, os
 from ..models.base import TextModel
-from ..prompts import load_prompt
+from ..prompts import get_template
+VERIFIER_RULES = ("majority", "sprt")
 class Verifier:
-    def __init__(self, model: TextModel):
-        self.model = model
+    """
+    Votes ACCEPT/REJECT over up to `passes` calls, drawn in batched rounds and stopped as soon as the
+    verdict is settled.
+
+    rule="majority": accept iff passes//2+1 votes accept; each round draws the fewest votes that could
+    settle it, so no vote is spent after the majority is reached or has become unreachable.
+    rule="sprt": Wald's sequential probability ratio test between "accepts with p=p_hi" and "accepts with
+    p=p_lo", with false-accept rate 0.5*(1-strictness) and false-reject rate 0.5*strictness; at the pass
+    cap, undecided runs accept iff the log-likelihood ratio is positive.
+    temperature > 0 samples diverse votes; at 0 the votes of a round are greedy repeats.
+    Env: NLEL_VERIFIER_RULE (default "majority").
+    """
+    def __init__(self, model: TextModel, rule: Optional[str] = None, temperature: float = 0.0, p_hi: float = 0.8, p_lo: float = 0.2):
+        self.model = model; self.rule = rule or os.getenv("NLEL_VERIFIER_RULE", "majority"); self.temperature = float(temperature)
+        if self.rule not in VERIFIER_RULES: raise ValueError(f"Unsupported verifier rule: {self.rule}")
+        self.p_hi = p_hi; self.p_lo = p_lo
+    def _sprt(self, strictness: float) -> Tuple[float, float, float, float]:
+        alpha = min(0.49, max(0.01, 0.5 * (1.0 - strictness))); beta = min(0.49, max(0.01, 0.5 * strictness))
+        upper = math.log((1 - beta) / alpha); lower = math.log(beta / (1 - alpha))
+        return upper, lower, math.log(self.p_hi / self.p_lo), math.log((1 - self.p_hi) / (1 - self.p_lo))
     def verify(self, task: str, candidate: str, strictness: float = 0.5, passes: int = 1) -> Tuple[bool, Dict[str, Any]]:
-        accept_votes = 0; usage_total = {"prompt_tokens":0, "completion_tokens":0}
-        for _ in range(max(1, passes)):
-            resp, meta = self.model.generate(load_prompt("verifier.txt").format(task=task, candidate=candidate, strictness=str(strictness)), temperature=0.0, top_p=1.0, max_tokens=4)
-            txt = (resp or "").strip().upper()
-            accept = "ACCEPT" in txt and "REJECT" not in txt
-            if accept: accept_votes += 1
-            u = meta.get("usage", {})
-            usage_total["prompt_tokens"] += int(u.get("prompt_tokens",0)); usage_total["completion_tokens"] += int(u.get("completion_tokens",0))
-        return accept_votes >= (passes // 2 + 1), {"usage": usage_total}
+        accept_votes = 0; votes = 0; usage_total = {"prompt_tokens":0, "completion_tokens":0}
+        n = max(1, passes); need = passes // 2 + 1
+        tmpl = get_template("verifier.txt")
+        prompt = tmpl.format(task=task, candidate=candidate, strictness=str(strictness)); prefix = tmpl.prefix("candidate", task=task)
+        if self.rule == "sprt": upper, lower, w_acc, w_rej = self._sprt(strictness)
+        verdict = None
+        while verdict is None and votes < n:
+            if self.rule == "majority":
+                k = min(need - accept_votes, (n - need + 1) - (votes - accept_votes))
+            else:
+                llr = accept_votes * w_acc + (votes - accept_votes) * w_rej
+                k = min(math.ceil((upper - llr) / w_acc), math.ceil((lower - llr) / w_rej))
+            gens = self.model.batch_generate([prompt] * max(1, min(k, n - votes)), temperature=self.temperature, top_p=1.0, max_tokens=4, cache_prefix=prefix)
+            for resp, meta in gens:
+                txt = (resp or "").strip().upper()
+                accept = "ACCEPT" in txt and "REJECT" not in txt
+                if accept: accept_votes += 1
+                u = meta.get("usage", {})
+                usage_total["prompt_tokens"] += int(u.get("prompt_tokens",0)); usage_total["completion_tokens"] += int(u.get("completion_tokens",0))
+            votes += len(gens)
+            if self.rule == "majority":
+                if accept_votes >= need: verdict = True
+                elif votes - accept_votes > n - need: verdict = False
+            else:
+                llr = accept_votes * w_acc + (votes - accept_votes) * w_rej
+                if llr >= upper: verdict = True
+                elif llr <= lower: verdict = False
+        if verdict is None:
+            verdict = accept_votes >= need if self.rule == "majority" else accept_votes * w_acc + (votes - accept_votes) * w_rej > 0
+        return verdict, {"usage": usage_total, "votes": votes, "accept_votes": accept_votes}
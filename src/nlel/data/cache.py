@@ -0,0 +1,115 @@
+from typing import Any, Dict, Iterator, List, Optional, Union
+import functools, importlib.util, json, mmap, os
+import typer
+from rich import print
+from ..utils import ensure_dir
+
+app = typer.Typer(add_completion=False)
+
+def cache_dir() -> str:
+    """Env: NLEL_DATA_CACHE_DIR (default ./.nlel_cache/data)."""
+    return os.getenv("NLEL_DATA_CACHE_DIR") or os.path.join(".nlel_cache", "data")
+
+def _has_arrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+def split_path(name: str, split: str, version: int, root: Optional[str] = None) -> str:
+    """Cache file of one benchmark split; the loader version is part of the name, so a bumped loader rebuilds."""
+    ext = "arrow" if _has_arrow() else "jsonl"
+    return os.path.join(root or cache_dir(), f"{name}-{split}-v{version}.{ext}")
+
+def _write(path: str, rows: List[Dict[str, Any]]) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+        table = pa.table({k: pa.array([r[k] for r in rows], type=pa.string()) for k in ("id", "question", "answer")})
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        # JSONL plus a sidecar index of (id, byte offset) so rows can be read without parsing the whole file.
+        index = []; pos = 0
+        with open(tmp, "wb") as f:
+            for r in rows:
+                line = (json.dumps({k: r[k] for k in ("id", "question", "answer")}, ensure_ascii=False) + "\n").encode("utf-8")
+                index.append([r["id"], pos]); f.write(line); pos += len(line)
+        with open(f"{path}.idx.tmp.{os.getpid()}", "w", encoding="utf-8") as f: json.dump(index, f)
+        os.replace(f"{path}.idx.tmp.{os.getpid()}", f"{path}.idx")
+    os.replace(tmp, path)
+
+class CachedSplit:
+    """
+    Read-only view of a materialized split of {id, question, answer} rows. The file is memory-mapped (an
+    Arrow IPC file, or JSONL with an offsets index when pyarrow is missing), so opening it costs no parsing;
+    rows are decoded on access. Index with positions or slices, or look rows up by id with `get`/`select`.
+    """
+    def __init__(self, path: str):
+        self.path = path; self._by_id: Optional[Dict[str, int]] = None
+        if path.endswith(".arrow"):
+            import pyarrow as pa
+            self._table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all(); self._ids = None; self._n = self._table.num_rows
+        else:
+            self._table = None
+            with open(f"{path}.idx", "r", encoding="utf-8") as f: index = json.load(f)
+            self._ids = [i for i, _ in index]; self._offsets = [o for _, o in index] + [os.path.getsize(path)]; self._n = len(index)
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._n else b""
+    def __len__(self) -> int:
+        return self._n
+    def _rows(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        if self._table is not None: return self._table.slice(start, max(0, stop - start)).to_pylist()
+        return [json.loads(self._mm[self._offsets[i]:self._offsets[i + 1]]) for i in range(start, stop)]
+    def __getitem__(self, key: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._n)
+            rows = self._rows(start, stop) if step > 0 else [self[i] for i in range(start, stop, step)]
+            return rows[::step] if step > 1 else rows
+        i = key + self._n if key < 0 else key
+        if not 0 <= i < self._n: raise IndexError(key)
+        return self._rows(i, i + 1)[0]
+    def ids(self) -> List[str]:
+        return self._ids if self._ids is not None else self._table.column("id").to_pylist()
+    def position(self, id: str) -> int:
+        if self._by_id is None: self._by_id = {x: i for i, x in enumerate(self.ids())}
+        return self._by_id[id]
+    def get(self, id: str) -> Dict[str, Any]:
+        return self[self.position(id)]
+    def select(self, ids: List[str]) -> List[Dict[str, Any]]:
+        return [self.get(i) for i in ids]
+    def between(self, first_id: str, last_id: str) -> List[Dict[str, Any]]:
+        """Rows from `first_id` through `last_id` inclusive, in split order."""
+        return self[self.position(first_id):self.position(last_id) + 1]
+    def iter(self, subset: Optional[int] = None, chunk: int = 256) -> Iterator[Dict[str, Any]]:
+        n = self._n if subset is None else min(self._n, subset)
+        for start in range(0, n, chunk): yield from self._rows(start, min(n, start + chunk))
+
+def materialize(name: str, split: str = "test", root: Optional[str] = None, force: bool = False) -> str:
+    """Run the benchmark's loader once over the full split and write its rows to the cache; returns the path."""
+    from .loaders import LOADER_VERSIONS, RAW_LOADERS
+    path = split_path(name, split, LOADER_VERSIONS[name], root)
+    if force or not os.path.exists(path):
+        ensure_dir(os.path.dirname(path))
+        _write(path, list(RAW_LOADERS[name](split=split, subset=None)))
+        open_split.cache_clear()
+    return path
+
+@functools.lru_cache(maxsize=None)
+def open_split(path: str) -> CachedSplit:
+    return CachedSplit(path)
+
+def load_split(name: str, split: str = "test", root: Optional[str] = None) -> CachedSplit:
+    """The cached split, materialized first if it is not on disk yet."""
+    return open_split(materialize(name, split, root))
+
+@app.command()
+def build(
+    benchmark: str = typer.Option(..., help="Comma-separated: gsm8k | math_subset | strategyqa | arc_challenge"),
+    split: str = typer.Option("test", help="Dataset split"),
+    root: str = typer.Option(None, help="Cache directory (default: NLEL_DATA_CACHE_DIR or ./.nlel_cache/data)"),
+    force: bool = typer.Option(False, "--force", help="Rebuild even if the cache file exists"),
+):
+    for name in benchmark.split(","):
+        path = materialize(name.strip(), split, root, force=force)
+        print(f"{name.strip()}/{split}: {len(open_split(path))} rows -> {path}")
+
+if __name__ == "__main__":
+    app()
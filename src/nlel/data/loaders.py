@@ -1,29 +1,32 @@
 
 import os
-try:
-    from datasets import DownloadConfig
-    _NLEL_LOCAL_ONLY = os.getenv("HF_DATASETS_OFFLINE", "0") == "1"
-    def _dlcfg(): return DownloadConfig(local_files_only=_NLEL_LOCAL_ONLY)
-except Exception:
-    _NLEL_LOCAL_ONLY = False
-    def _dlcfg(): return None
-from typing import Iterator, Dict, Any, Optional
-import datasets
-import re
+from typing import Iterator, Dict, Any, Optional, Callable
+import inspect, re
+_NLEL_LOCAL_ONLY = os.getenv("HF_DATASETS_OFFLINE", "0") == "1"
+def _dlcfg():
+    try:
+        from datasets import DownloadConfig
+    except Exception:
+        return None
+    return DownloadConfig(local_files_only=_NLEL_LOCAL_ONLY)
+def _load_dataset(*args):
+    # `datasets` takes about a second to import; only loaders that actually read a dataset pay for it.
+    import datasets
+    return datasets.load_dataset(*args, download_config=_dlcfg())
 def load_gsm8k(split: str = "test", subset: Optional[int] = None) -> Iterator[Dict[str, Any]]:
-    ds = datasets.load_dataset("openai/gsm8k", "main", download_config=_dlcfg())[split]
+    ds = _load_dataset("openai/gsm8k", "main")[split]
     for i, row in enumerate(ds):
         if subset is not None and i >= subset: break
         yield {"id": f"gsm8k-{i}", "question": row["question"], "answer": row["answer"]}
 def load_strategyqa(split: str = "test", subset: Optional[int] = None) -> Iterator[Dict[str, Any]]:
-    ds = datasets.load_dataset("strategyqa", "default", download_config=_dlcfg())[split]
+    ds = _load_dataset("strategyqa", "default")[split]
     for i, row in enumerate(ds):
         if subset is not None and i >= subset: break
         ans = row.get("answer", None)
         gold = None if ans is None else ("yes" if ans else "no")
         yield {"id": f"strategyqa-{i}", "question": row["question"], "answer": gold}
 def load_arc_challenge(split: str = "test", subset: Optional[int] = None) -> Iterator[Dict[str, Any]]:
-    ds = datasets.load_dataset("ai2_arc", "ARC-Challenge", download_config=_dlcfg())[split]
+    ds = _load_dataset("ai2_arc", "ARC-Challenge")[split]
     for i, row in enumerate(ds):
         if subset is not None and i >= subset: break
         stem = row["question"]; choices = row["choices"]["text"]; label = row["choices"]["label"]; gold_label = row["answerKey"]
@@ -40,7 +43,7 @@ def load_math_subset(split: str = "test", subset: Optional[int] = 500) -> Iterat
     falling back to any 'answer' field, and skip items we cannot parse.
     Returns dicts with keys: {"id", "question", "answer"}.
     """
-    ds = datasets.load_dataset("hendrycks/competition_math", "all", download_config=_dlcfg())[split]
+    ds = _load_dataset("hendrycks/competition_math", "all")[split]
     count = 0
     for i, row in enumerate(ds):
         if subset is not None and count >= subset:
@@ -63,9 +66,25 @@ def load_math_subset(split: str = "test", subset: Optional[int] = 500) -> Iterat
             continue
         yield {"id": f"math-compet-{i}", "question": q, "answer": gold}
         count += 1
-def get_loader(name: str):
-    if name == "gsm8k": return load_gsm8k
-    if name == "strategyqa": return load_strategyqa
-    if name == "arc_challenge": return load_arc_challenge
-    if name == "math_subset": return load_math_subset
-    raise ValueError(f"Unknown benchmark: {name}")
+# Bump a loader's version whenever its output changes; cached splits (data.cache) are keyed by it.
+LOADER_VERSIONS: Dict[str, int] = {"gsm8k": 1, "strategyqa": 1, "arc_challenge": 1, "math_subset": 1}
+RAW_LOADERS: Dict[str, Callable[..., Iterator[Dict[str, Any]]]] = {
+    "gsm8k": load_gsm8k, "strategyqa": load_strategyqa, "arc_challenge": load_arc_challenge, "math_subset": load_math_subset,
+}
+
+def _cached(name: str):
+    raw = RAW_LOADERS[name]; default_subset = inspect.signature(raw).parameters["subset"].default
+    def load(split: str = "test", subset: Optional[int] = default_subset) -> Iterator[Dict[str, Any]]:
+        from .cache import load_split
+        return load_split(name, split).iter(subset)
+    load.__name__ = raw.__name__; load.__doc__ = raw.__doc__
+    return load
+
+def get_loader(name: str, cached: Optional[bool] = None):
+    """
+    Loader for a benchmark. By default rows come from the local split cache (data.cache), which runs the
+    loader once per split and loader version; cached=False, or env NLEL_DATA_CACHE=0, reads the dataset directly.
+    """
+    if name not in RAW_LOADERS: raise ValueError(f"Unknown benchmark: {name}")
+    if cached is None: cached = os.getenv("NLEL_DATA_CACHE", "1") != "0"
+    return _cached(name) if cached else RAW_LOADERS[name]
@@ -1,20 +1,105 @@
 
-from typing import Callable, Sequence, Tuple
+from typing import Callable, Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
+from statistics import NormalDist
 import numpy as np
 
-def bootstrap_ci(values: Sequence[float], stat: Callable[[np.ndarray], float], alpha: float = 0.05, n_resamples: int = 10000, random_state: int = 42) -> Tuple[float, float]:
+Stat = Union[str, Callable[..., float]]
+_REDUCERS = {"mean": np.mean, "median": np.median, "sum": np.sum, "std": np.std}
+_MAX_CHUNK_ELEMENTS = 1 << 22  # ~32 MB of int64 indices per chunk
+
+def _row_stat(stat: Stat) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Lift a statistic to act on every row of a (k, n) matrix. Names and NumPy reductions are called with
+    axis=-1; other callables fall back to a row-wise apply.
+    """
+    if isinstance(stat, str):
+        f = _REDUCERS[stat]; return lambda m: f(m, axis=-1)
+    def apply(m: np.ndarray) -> np.ndarray:
+        try:
+            out = np.asarray(stat(m, axis=-1))
+            if out.shape == m.shape[:-1]: return out
+        except TypeError:
+            pass
+        return np.apply_along_axis(stat, -1, m)
+    return apply
+
+def resample_indices(n: int, n_resamples: int, rng: np.random.Generator, chunk_size: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Yield (k, n) matrices of with-replacement indices, k <= chunk_size, n_resamples rows in total."""
+    chunk = int(chunk_size or max(1, _MAX_CHUNK_ELEMENTS // max(1, n)))
+    done = 0
+    while done < n_resamples:
+        k = min(chunk, n_resamples - done)
+        yield rng.integers(0, n, size=(k, n)); done += k
+
+def _jackknife(values: np.ndarray, f: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """Leave-one-out statistics, built as (k, n-1) matrices in chunks."""
+    n = len(values); out = np.empty(n)
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // max(1, n))
+    for start in range(0, n, chunk):
+        rows = np.arange(start, min(n, start + chunk))
+        keep = np.ones((len(rows), n), dtype=bool); keep[np.arange(len(rows)), rows] = False
+        out[rows] = f(np.broadcast_to(values, keep.shape)[keep].reshape(len(rows), n - 1))
+    return out
+
+def _interval(dist: np.ndarray, alpha: float, method: str, theta_hat: float = float("nan"), jack: Optional[np.ndarray] = None) -> Tuple[float, float]:
+    q = np.array([alpha / 2, 1 - alpha / 2])
+    if method == "bca":
+        nd = NormalDist(); b = len(dist)
+        # Bias correction from the share of resamples below the point estimate (clipped away from 0/1).
+        p0 = min(max(np.mean(dist < theta_hat) + 0.5 * np.mean(dist == theta_hat), 1 / (b + 1)), b / (b + 1))
+        z0 = nd.inv_cdf(p0)
+        d = jack.mean() - jack; den = 6.0 * float(np.sum(d ** 2)) ** 1.5
+        acc = float(np.sum(d ** 3)) / den if den > 0 else 0.0
+        z = np.array([nd.inv_cdf(x) for x in q])
+        q = np.array([nd.cdf(z0 + (z0 + zi) / (1 - acc * (z0 + zi))) for zi in z])
+    elif method != "percentile":
+        raise ValueError(f"Unsupported bootstrap CI method: {method}")
+    lo, hi = np.quantile(dist, q)
+    return float(lo), float(hi)
+
+def bootstrap_distributions(columns: Mapping[str, Sequence[float]], stat: Stat = "mean", n_resamples: int = 10000, random_state: int = 42,
+                            diffs: Sequence[Tuple[str, str]] = (), chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
     """
-    Basic percentile bootstrap CI for a statistic over 'values'.
+    Bootstrap distributions of `stat` for several paired columns (same items, same length) in one pass:
+    every resample draws one index row shared by all columns. `diffs` adds "a-b" entries holding the
+    paired difference stat(a) - stat(b) per resample.
     """
+    arrays = {k: np.asarray(v, dtype=float) for k, v in columns.items()}
+    lengths = {len(v) for v in arrays.values()}
+    if len(lengths) != 1: raise ValueError("bootstrap columns must have equal length (paired items)")
+    n = lengths.pop(); f = _row_stat(stat)
+    out: Dict[str, list] = {k: [] for k in arrays}
     rng = np.random.default_rng(random_state)
-    values = np.asarray(values, dtype=float)
-    if len(values) == 0:
-        return float('nan'), float('nan')
-    stats = []
-    n = len(values)
-    for _ in range(n_resamples):
-        sample = rng.choice(values, size=n, replace=True)
-        stats.append(stat(sample))
-    lo = float(np.percentile(stats, 100 * alpha / 2))
-    hi = float(np.percentile(stats, 100 * (1 - alpha / 2)))
-    return lo, hi
+    for idx in resample_indices(n, n_resamples, rng, chunk_size):
+        for k, v in arrays.items(): out[k].append(f(v[idx]))
+    dists = {k: np.concatenate(v) for k, v in out.items()}
+    for a, b in diffs: dists[f"{a}-{b}"] = dists[a] - dists[b]
+    return dists
+
+def bootstrap_cis(columns: Mapping[str, Sequence[float]], stat: Stat = "mean", alpha: float = 0.05, n_resamples: int = 10000, random_state: int = 42,
+                  diffs: Sequence[Tuple[str, str]] = (), method: str = "percentile", chunk_size: Optional[int] = None) -> Dict[str, Tuple[float, float]]:
+    """CIs for several paired columns and their differences from a single set of resamples (percentile or BCa)."""
+    arrays = {k: np.asarray(v, dtype=float) for k, v in columns.items()}
+    if not arrays or len(next(iter(arrays.values()))) == 0:
+        return {**{k: (float("nan"), float("nan")) for k in arrays}, **{f"{a}-{b}": (float("nan"), float("nan")) for a, b in diffs}}
+    dists = bootstrap_distributions(arrays, stat, n_resamples, random_state, diffs, chunk_size)
+    if method != "bca":
+        return {k: _interval(d, alpha, method) for k, d in dists.items()}
+    f = _row_stat(stat)
+    point = {k: float(f(v[None, :])[0]) for k, v in arrays.items()}
+    jack = {k: _jackknife(v, f) for k, v in arrays.items()}
+    for a, b in diffs:
+        point[f"{a}-{b}"] = point[a] - point[b]; jack[f"{a}-{b}"] = jack[a] - jack[b]
+    return {k: _interval(d, alpha, method, point[k], jack[k]) for k, d in dists.items()}
+
+def bootstrap_ci(values: Sequence[float], stat: Stat = "mean", alpha: float = 0.05, n_resamples: int = 10000, random_state: int = 42,
+                 method: str = "percentile", chunk_size: Optional[int] = None) -> Tuple[float, float]:
+    """
+    Bootstrap CI for a statistic over 'values' (percentile by default, or "bca").
+    """
+    return bootstrap_cis({"x": values}, stat, alpha, n_resamples, random_state, method=method, chunk_size=chunk_size)["x"]
+
+def paired_bootstrap_ci(a: Sequence[float], b: Sequence[float], stat: Stat = "mean", alpha: float = 0.05, n_resamples: int = 10000, random_state: int = 42,
+                        method: str = "percentile", chunk_size: Optional[int] = None) -> Tuple[float, float]:
+    """CI of stat(a) - stat(b) over paired items, resampling items jointly."""
+    return bootstrap_cis({"a": a, "b": b}, stat, alpha, n_resamples, random_state, diffs=[("a", "b")], method=method, chunk_size=chunk_size)["a-b"]
@@ -1,4 +1,4 @@
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, List
 import json, re
 from ..models.base import TextModel
 
@@ -11,18 +11,34 @@ def parse_final_answer(text: str) -> Optional[str]:
     return normalize_answer(m.group(1)) if m else None
 
 class ValueEstimator:
+    max_tokens = 64  # completion cap of a scoring call
     def __init__(self, model: Optional[TextModel] = None): self.model = model
-    def score(self, task: str, candidate: str):
-        if self.model is None:
-            mu = 0.35; sigma = 0.5; return mu, sigma, {"usage":{"prompt_tokens":0,"completion_tokens":0}}
-        from ..prompts import load_prompt
-        prompt = load_prompt("evaluator.txt").format(task=task, candidate=candidate)
-        resp, meta = self.model.generate(prompt, temperature=0.0, top_p=1.0, max_tokens=64)
+    @staticmethod
+    def _parse(resp: str) -> Tuple[float, float]:
         try:
             obj = json.loads(resp); mu = float(obj.get("mu",0.5)); sigma = float(obj.get("sigma",0.5))
         except Exception:
             mu, sigma = 0.5, 0.5
+        return mu, sigma
+    def _prompts(self, task: str, candidates: List[str]) -> Tuple[List[str], str]:
+        from ..prompts import get_template
+        tmpl = get_template("evaluator.txt").partial(task=task)
+        # The task-bearing head of the prompt is shared by every candidate; backends may cache it.
+        return [tmpl.format(candidate=c) for c in candidates], tmpl.prefix("candidate")
+    def score(self, task: str, candidate: str):
+        if self.model is None:
+            mu = 0.35; sigma = 0.5; return mu, sigma, {"usage":{"prompt_tokens":0,"completion_tokens":0}}
+        (prompt,), prefix = self._prompts(task, [candidate])
+        resp, meta = self.model.generate(prompt, temperature=0.0, top_p=1.0, max_tokens=self.max_tokens, cache_prefix=prefix)
+        mu, sigma = self._parse(resp)
         return mu, sigma, meta
+    def score_batch(self, task: str, candidates: List[str]) -> List[Tuple[float, float, Dict[str, Any]]]:
+        """Score several candidates for one task through a single `batch_generate` call."""
+        if self.model is None or not candidates:
+            return [self.score(task, c) for c in candidates]
+        prompts, prefix = self._prompts(task, candidates)
+        gens = self.model.batch_generate(prompts, temperature=0.0, top_p=1.0, max_tokens=self.max_tokens, cache_prefix=prefix)
+        return [(*self._parse(resp), meta) for resp, meta in gens]
 
 class ExactMatchChecker:
     def __init__(self, gold: str): self.gold = normalize_answer(gold)
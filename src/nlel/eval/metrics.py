@@ -1,7 +1,9 @@
-from typing import List, Dict, Any, Tuple
-import pandas as pd, numpy as np
+from typing import List, Dict, Any, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    import pandas as pd
 BUDGETS = [0.5, 1.0, 2.0]
-def summarize(rows: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def summarize(rows: List[Dict[str, Any]]) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+    import pandas as pd, numpy as np
     if not rows: return pd.DataFrame(), pd.DataFrame()
     df = pd.DataFrame(rows)
     if "correct" in df.columns: df["correct"] = df["correct"].astype("boolean")
@@ -19,7 +21,7 @@ def summarize(rows: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
         if mask_v.any():
             var = df.loc[mask_v, "verified"].astype("boolean").mean()
             agg.append({"metric":"verification_accept_rate_overall", "value": float(var)})
-for b in BUDGETS:
+    for b in BUDGETS:
         sub = df[df["budget_multiplier"]==b]
         # accuracy@compute slice
         agg.append({"metric":f"accuracy_at_{b}x", "value": float(sub["correct"].mean()) if len(sub) else float("nan")})
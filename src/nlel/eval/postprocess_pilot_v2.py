@@ -4,7 +4,7 @@ from typing import Dict, Any, List, Tuple
 from pathlib import Path
 import numpy as np
 from .mcnemar import mcnemar
-from .bootstrap import bootstrap_ci
+from .bootstrap import bootstrap_ci, bootstrap_cis
 
 def read_jsonl(path: Path) -> List[Dict[str, Any]]:
     rows = []
@@ -99,19 +99,10 @@ def evaluate_pairs(tot_rows: List[Dict[str, Any]], nlel_rows: List[Dict[str, Any
         return float(np.median(toks))
     tps_tot = tps([x[0] for x in keep])
     tps_nle = tps([x[1] for x in keep])
-    # bootstrap CIs for accuracy
-    rng = np.random.default_rng(42)
-    def boot_ci_binary(vals):
-        vals = np.array(vals, dtype=int)
-        n = len(vals)
-        stats = []
-        for _ in range(10000):
-            idx = rng.choice(np.arange(n), size=n, replace=True)
-            stats.append(np.mean(vals[idx]))
-        lo, hi = float(np.percentile(stats, 2.5)), float(np.percentile(stats, 97.5))
-        return lo, hi
-    ci_tot = boot_ci_binary(y_tot)
-    ci_nle = boot_ci_binary(y_nle)
+    # bootstrap CIs for accuracy (one shared set of paired resamples for both arms and their difference)
+    cis = bootstrap_cis({"tot": y_tot, "nlel": y_nle}, "mean", n_resamples=10000, random_state=42, diffs=[("nlel", "tot")])
+    ci_tot = cis["tot"]
+    ci_nle = cis["nlel"]
     return {
         "n_paired": n,
         "cap_tokens": cap_tokens,
@@ -119,6 +110,7 @@ def evaluate_pairs(tot_rows: List[Dict[str, Any]], nlel_rows: List[Dict[str, Any
         "accuracy_nlel": acc_nle,
         "accuracy_ci_tot": ci_tot,
         "accuracy_ci_nlel": ci_nle,
+        "accuracy_diff_ci": cis["nlel-tot"],
         "mcnemar_b01": b01,
         "mcnemar_b10": b10,
         "mcnemar_chi2": chi2,
@@ -1,17 +1,18 @@
-import json, os
-from typing import Optional, Dict, Any, List
+import os
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 import typer
 from rich import print
 from rich.table import Table
 from ..models.base import get_model
+from ..models.tracing import Tracer, TracingTextModel, role_model
 from ..controllers.cot import run_cot, run_sc_cot
-from ..controllers.nlel import Labeller, TunerJPE, run_instance
-from ..controllers.tot_baseline import run_tot, ToTParams
+from ..controllers.nlel import Labeller, TunerJPE, FusedLabellerTuner, run_instance
+from ..controllers.tot_baseline import run_tot
 from ..controllers.react_baseline import run_react
 from ..controllers.verifier import Verifier
-from ..eval.evaluator import ValueEstimator
+from ..controllers.anytime import outcome_at_budget
 from ..data.loaders import get_loader
-from ..utils import ensure_dir, now_ts, safe_jsonl_write, set_seed
+from ..utils import ensure_dir, now_ts, set_seed, JsonlAppender, completed_keys, read_jsonl, row_key
 from ..config import DEFAULT_SEEDS
 
 app = typer.Typer(add_completion=False)
@@ -20,6 +21,73 @@ def make_outdir(outdir: Optional[str]) -> str:
     if outdir: ensure_dir(outdir); return outdir
     path = os.path.join("results", now_ts()); ensure_dir(path); return path
 
+def build_roles(controller: str, model, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-seed controller objects (the NLEL tuner ledger lives for one seed's pass over the examples)."""
+    if controller == "tot_verifier": return {"verifier": Verifier(model=role_model(model, "verifier"))}
+    if controller == "nlel" and opts["fused_controller"]:
+        if opts["ablate_labeller"] or opts["ablate_tuner"] or opts["random_labels"]:
+            raise ValueError("--fused-controller cannot be combined with --ablate-labeller, --ablate-tuner or --random-labels")
+        if opts["tuner_cache"]:
+            raise ValueError("--fused-controller cannot be combined with --tuner-cache (the fused call has no control cache)")
+        fused = FusedLabellerTuner(model=role_model(model, "labeller_tuner"), max_labels=3, trust_region_r=0.15, no_trust_region=opts["no_trust_region"], quantize_bits=opts["quantize_controls"])
+        return {"labeller": fused, "tuner": fused, "verifier": Verifier(model=role_model(model, "verifier"))}
+    if controller == "nlel":
+        return {"labeller": Labeller(model=role_model(model, "labeller"), max_labels=3, random_labels=opts["random_labels"], frozen=opts["ablate_labeller"]),
+                "tuner": TunerJPE(model=role_model(model, "tuner"), trust_region_r=0.15, no_trust_region=opts["no_trust_region"], quantize_bits=opts["quantize_controls"], frozen=opts["ablate_tuner"], cache_size=opts["tuner_cache"]),
+                "verifier": Verifier(model=role_model(model, "verifier"))}
+    return {}
+
+BUDGETED = ("tot", "tot_verifier", "nlel")
+CONTROLLERS = ("cot", "sc_cot", "tot", "tot_verifier", "nlel", "react")
+# Derived rows replay the large-budget run's levels, but the budget guard trimmed those against the large budget.
+ANYTIME_GUARD_ERROR = "--anytime derives smaller budgets from a run trimmed to the largest one; add --no-budget-guard for tot/nlel"
+
+# run_item/build_roles options at their CLI defaults, for callers that run items without the CLI (experiments.sweep).
+RUN_DEFAULTS: Dict[str, Any] = dict(sc_samples=5, ablate_labeller=False, ablate_tuner=False, no_trust_region=False, ignore_verifier_control=False,
+                                    quantize_controls=0, random_labels=False, label_concurrency="serial", frontier_width=None, no_dedup=False,
+                                    no_budget_guard=False, tuner_cache=0, fused_controller=False, tokenizer=None)
+
+def run_item(controller: str, ex: Dict[str, Any], seed: int, bmults: Tuple[float, ...], model, roles: Dict[str, Any], opts: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Run one example under one seed and return one row per budget multiplier. Reseeds first so the rows do
+    not depend on which items ran before. With several multipliers the controller runs once at the largest
+    budget and smaller budgets are derived from its per-level token trace (controllers.anytime).
+    """
+    if len(bmults) > 1 and controller in BUDGETED and not opts["no_budget_guard"]:
+        raise ValueError(ANYTIME_GUARD_ERROR)
+    set_seed(seed)
+    budget = int(8000*max(bmults)); trace: Optional[List[Dict[str, Any]]] = [] if len(bmults) > 1 else None
+    if controller == "cot":
+        res = run_cot(ex["question"], model, max_tokens=256, gold_answer=ex.get("answer"))
+    elif controller == "sc_cot":
+        res = run_sc_cot(ex["question"], model, samples=opts["sc_samples"], max_tokens=256, gold_answer=ex.get("answer"))
+    elif controller in ("tot","tot_verifier"):
+        res = run_tot(ex["question"], model, gold_answer=ex.get("answer"), with_verifier=(controller=="tot_verifier"), verifier=roles.get("verifier"), verifier_passes=1, verifier_strictness=0.5, budget_tokens=budget, trace=trace, frontier_width=opts["frontier_width"], dedup=not opts["no_dedup"], budget_guard=not opts["no_budget_guard"])
+    elif controller == "nlel":
+        res = run_instance(ex["question"], gold_answer=ex.get("answer"), model=model, budget_tokens=budget, labeller=roles["labeller"], tuner=roles["tuner"], verifier=roles["verifier"], ignore_verifier_control=opts["ignore_verifier_control"], label_concurrency=opts["label_concurrency"], trace=trace, frontier_width=opts["frontier_width"], dedup=not opts["no_dedup"], budget_guard=not opts["no_budget_guard"])
+    elif controller == "react":
+        res = run_react(ex["question"], model, max_steps=6, max_tokens=256, gold_answer=ex.get("answer"))
+    else:
+        raise ValueError(f"Unsupported controller: {controller}")
+    rows = []
+    for bmult in bmults:
+        r = outcome_at_budget(res, trace, int(8000*bmult)) if trace is not None and controller in BUDGETED else res
+        rows.append({"seed": seed, "id": ex["id"], "controller": controller, "benchmark": opts["benchmark"], "tokens_total": r.get("tokens_total", 0), "correct": r.get("correct"), "final": r.get("final"), "budget_multiplier": bmult})
+    return rows
+
+# Process-pool workers: each loads its own model once and keeps per-seed controller objects.
+_WORKER: Dict[str, Any] = {}
+
+def _worker_init(model_spec: str, controller: str, opts: Dict[str, Any]) -> None:
+    _WORKER.update(model=get_model(model_spec, tokenizer=opts["tokenizer"]), controller=controller, opts=opts, roles={})
+
+def _worker_run(task) -> List[Dict[str, Any]]:
+    seed, bmults, ex = task
+    roles = _WORKER["roles"].get((seed, bmults))
+    if roles is None:
+        roles = _WORKER["roles"][(seed, bmults)] = build_roles(_WORKER["controller"], _WORKER["model"], _WORKER["opts"])
+    return run_item(_WORKER["controller"], ex, seed, bmults, _WORKER["model"], roles, _WORKER["opts"])
+
 @app.command()
 def main(
     benchmark: str = typer.Option(..., help="gsm8k | math_subset | strategyqa | arc_challenge"),
@@ -36,55 +104,64 @@ def main(
     ignore_verifier_control: bool = typer.Option(False, "--ignore-verifier-control", help="Do not use Π.verify_* fields"),
     quantize_controls: int = typer.Option(0, "--quantize-controls", help="Quantize continuous Π fields to 2^bits levels"),
     random_labels: bool = typer.Option(False, "--random-labels", help="Random label strings"),
-    report_sac: bool = typer.Option(False, "--report-sac", help="Run at {0.5,1.0,2.0}x budgets and write aggregate CSV")
+    report_sac: bool = typer.Option(False, "--report-sac", help="Run at the --sac-budgets multipliers and write aggregate CSV"),
+    sac_budgets: str = typer.Option("0.5,1.0,2.0", "--sac-budgets", help="Comma-separated budget multipliers for --report-sac"),
+    anytime: bool = typer.Option(False, "--anytime", help="With --report-sac, run each instance once at the largest budget and derive the smaller ones from its token trace (tot/nlel: needs --no-budget-guard)"),
+    label_concurrency: str = typer.Option("serial", "--label-concurrency", help="NLEL label expansion: serial | threads | batch | auto"),
+    fused_controller: bool = typer.Option(False, "--fused-controller", help="NLEL: one model call per node emits labels with their control vectors"),
+    tuner_cache: int = typer.Option(0, "--tuner-cache", help="NLEL: memoize up to N control vectors per (label, context signature); 0 = off"),
+    no_dedup: bool = typer.Option(False, "--no-dedup", help="Score and expand duplicate candidate steps separately (tot/nlel)"),
+    no_budget_guard: bool = typer.Option(False, "--no-budget-guard", help="Dispatch tot/nlel expansions without trimming them to the remaining budget"),
+    frontier_width: int = typer.Option(0, "--frontier-width", help="Max nodes expanded per level in tot/nlel (0 = every survivor; 1 = greedy chain)"),
+    workers: int = typer.Option(1, "--workers", help="Worker processes; each loads its own model and runs a shard of the examples"),
+    resume: bool = typer.Option(False, "--resume", help="Append to an existing JSONL and skip (seed, id, controller, budget) rows already in it"),
+    tokenizer: str = typer.Option(None, "--tokenizer", help="Token counter for backend-estimated usage: approx | tiktoken[:<encoding|model>] | hf:<path> (default: NLEL_TOKENIZER or approx)"),
+    trace_path: str = typer.Option(None, "--trace", help="Record every model call (role, depth, latency, tokens) to this file: .json = Chrome trace, else JSONL")
 ):
     outdir = make_outdir(outdir)
     seeds_list = [int(s) for s in seeds.split(",")] if seeds else list(DEFAULT_SEEDS)
     loader = get_loader(benchmark)
-    base_model = get_model(model)
+    opts = dict(benchmark=benchmark, sc_samples=sc_samples, ablate_labeller=ablate_labeller, ablate_tuner=ablate_tuner, no_trust_region=no_trust_region,
+                ignore_verifier_control=ignore_verifier_control, quantize_controls=quantize_controls, random_labels=random_labels, label_concurrency=label_concurrency,
+                frontier_width=frontier_width or None, no_dedup=no_dedup, no_budget_guard=no_budget_guard, tuner_cache=tuner_cache,
+                fused_controller=fused_controller, tokenizer=tokenizer)
+    if trace_path and workers > 1: raise typer.BadParameter("--trace records calls in this process; use it with --workers 1")
+    if anytime and report_sac and controller in BUDGETED and not no_budget_guard: raise typer.BadParameter(ANYTIME_GUARD_ERROR)
+    base_model = untraced = get_model(model, tokenizer=tokenizer) if workers <= 1 else None
+    tracer = Tracer() if trace_path else None
+    if tracer is not None: base_model = TracingTextModel(untraced, tracer)
+    if controller not in CONTROLLERS:
+        raise ValueError(f"Unsupported controller: {controller}")
+
+    jsonl_path = os.path.join(outdir, f"{benchmark}_{controller}.jsonl")
+    done = completed_keys(jsonl_path) if resume else set()
 
-    def run_one(bmult: float) -> List[Dict[str, Any]]:
-        rows: List[Dict[str, Any]] = []
+    def tasks(bmults: Tuple[float, ...]):
         for seed in seeds_list:
-            set_seed(seed)
-            if controller == "cot":
-                for ex in loader(split="test", subset=limit):
-                    res = run_cot(ex["question"], base_model, max_tokens=256, gold_answer=ex.get("answer"))
-                    rows.append({"seed": seed, "id": ex["id"], "controller": controller, "benchmark": benchmark, "tokens_total": res.get("tokens_total", 0), "correct": res.get("correct"), "final": res.get("final"), "budget_multiplier": bmult})
-            elif controller == "sc_cot":
-                for ex in loader(split="test", subset=limit):
-                    res = run_sc_cot(ex["question"], base_model, samples=sc_samples, max_tokens=256, gold_answer=ex.get("answer"))
-                    rows.append({"seed": seed, "id": ex["id"], "controller": controller, "benchmark": benchmark, "tokens_total": res.get("tokens_total", 0), "correct": res.get("correct"), "final": res.get("final"), "budget_multiplier": bmult})
-            elif controller in ("tot","tot_verifier"):
-                verifier = Verifier(model=base_model) if controller == "tot_verifier" else None
-                for ex in loader(split="test", subset=limit):
-                    res = run_tot(ex["question"], base_model, gold_answer=ex.get("answer"), with_verifier=(controller=="tot_verifier"), verifier=verifier, verifier_passes=1, verifier_strictness=0.5, budget_tokens=int(8000*bmult))
-                    rows.append({"seed": seed, "id": ex["id"], "controller": controller, "benchmark": benchmark, "tokens_total": res.get("tokens_total", 0), "correct": res.get("correct"), "final": res.get("final"), "budget_multiplier": bmult})
-            elif controller == "nlel":
-                labeller = Labeller(model=base_model, max_labels=3, random_labels=random_labels, frozen=ablate_labeller)
-                tuner = TunerJPE(model=base_model, trust_region_r=0.15, no_trust_region=no_trust_region, quantize_bits=quantize_controls, frozen=ablate_tuner)
-                verifier = Verifier(model=base_model)
-                for ex in loader(split="test", subset=limit):
-                    res = run_instance(ex["question"], gold_answer=ex.get("answer"), model=base_model, budget_tokens=int(8000*bmult), labeller=labeller, tuner=tuner, verifier=verifier, ignore_verifier_control=ignore_verifier_control)
-                    rows.append({"seed": seed, "id": ex["id"], "controller": controller, "benchmark": benchmark, "tokens_total": res.get("tokens_total", 0), "correct": res.get("correct"), "final": res.get("final"), "budget_multiplier": bmult})
-            else:
-            elif controller == "react":
-                for ex in loader(split="test", subset=limit):
-                    res = run_react(ex["question"], base_model, max_steps=6, max_tokens=256, gold_answer=ex.get("answer"))
-                    rows.append({"seed": seed, "id": ex["id"], "tokens_total": res.get("tokens_total", 0), "correct": res.get("correct"), "final": res.get("final"), "budget_multiplier": bmult})
-                raise ValueError(f"Unsupported controller: {controller}")
-        return rows
-
-    all_rows: List[Dict[str, Any]] = []
-    if report_sac:
-        for b in [0.5, 1.0, 2.0]:
-            all_rows.extend(run_one(b))
-    else:
-        all_rows.extend(run_one(budget_multiplier))
+            for ex in loader(split="test", subset=limit):
+                todo = tuple(b for b in bmults if row_key({"seed": seed, "id": ex["id"], "controller": controller, "budget_multiplier": b}) not in done)
+                if todo: yield seed, todo, ex
 
-    jsonl_path = os.path.join(outdir, f"{benchmark}_{controller}.jsonl")
-    with open(jsonl_path, "w", encoding="utf-8") as f:
-        for r in all_rows: f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    def run_one(bmults: Tuple[float, ...]) -> Iterator[Dict[str, Any]]:
+        if workers <= 1:
+            roles: Dict[int, Dict[str, Any]] = {}
+            for seed, todo, ex in tasks(bmults):
+                if seed not in roles: roles[seed] = build_roles(controller, base_model, opts)
+                yield from run_item(controller, ex, seed, todo, base_model, roles[seed], opts)
+            return
+        # Examples are sharded across processes; imap streams rows back in submission order.
+        import multiprocessing as mp
+        with mp.get_context("spawn").Pool(processes=workers, initializer=_worker_init, initargs=(model, controller, opts)) as pool:
+            for rows in pool.imap(_worker_run, tasks(bmults), chunksize=1): yield from rows
+
+    budgets = [float(b) for b in sac_budgets.split(",")] if report_sac else [budget_multiplier]
+    # Anytime: one pass over all budgets; otherwise one full pass per budget.
+    passes = [tuple(budgets)] if anytime else [(b,) for b in budgets]
+    # Rows are appended as they finish, so a crash keeps everything written so far (see --resume).
+    with JsonlAppender(jsonl_path, append=resume) as out:
+        for bmults in passes:
+            for row in run_one(bmults): out.write(row)
+    all_rows = read_jsonl(jsonl_path)
 
     from ..eval.metrics import summarize
     per_df, agg_df = summarize(all_rows)
@@ -103,9 +180,21 @@ def main(
     table.add_column("Avg tokens", justify="right", style="yellow")
     table.add_row(str(n), f"{acc:.3f}" if acc==acc else "nan", f"{avg_tokens:.1f}")
     print(table)
+    if tracer is not None:
+        tracer.export(trace_path)
+        calls = Table(title="Model calls by role")
+        for col in ("Role", "Calls", "Rows", "Wall s", "Mean ms", "Queue ms", "TTFT ms", "Prompt tok", "Completion tok"):
+            calls.add_column(col, justify="left" if col == "Role" else "right")
+        for role, a in sorted(tracer.aggregates().items()):
+            ttft = f"{1000 * a['ttft_s'] / a['ttft_n']:.1f}" if a["ttft_n"] else "-"
+            calls.add_row(role, str(a["calls"]), str(a["rows"]), f"{a['wall_s']:.2f}", f"{1000 * a['wall_s'] / a['calls']:.1f}", f"{1000 * a['queue_s'] / a['calls']:.1f}", ttft,
+                          str(a["prompt_tokens"]), str(a["completion_tokens"]))
+        print(calls)
     print(f"[bold]Saved details:[/bold] {jsonl_path}")
     print(f"[bold]Per-run CSV:[/bold] {per_csv}")
     print(f"[bold]Aggregate CSV:[/bold] {agg_csv}")
+    if tracer is not None: print(f"[bold]Call trace:[/bold] {trace_path}")
+    if untraced is not None and hasattr(untraced, "stats"): print(f"[bold]Generation cache:[/bold] {untraced.stats()}")
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
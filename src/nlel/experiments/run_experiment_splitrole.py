@@ -1,4 +1,4 @@
-import os, json
+import os
 from typing import Optional, Dict, Any, List
 import typer
 from rich import print
@@ -8,7 +8,7 @@ from ..controllers.nlel import Labeller, TunerJPE, run_instance
 from ..controllers.tot_baseline import run_tot, ToTParams
 from ..controllers.verifier import Verifier
 from ..data.loaders import get_loader
-from ..utils import ensure_dir, now_ts, safe_jsonl_write, set_seed
+from ..utils import ensure_dir, now_ts, set_seed, JsonlAppender, completed_keys, read_jsonl
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
 
@@ -31,8 +31,10 @@ def main(
     no_trust_region: bool = typer.Option(False, "--no-trust-region"),
     quantize_bits: int = typer.Option(0, "--quantize-bits", help="Per-field quantization bits for Π (0 = none)"),
     no_labeller: bool = typer.Option(False, "--no-labeller", help="Freeze Λ to default label L_def for No-Λ ablation"),
+    label_concurrency: str = typer.Option("serial", "--label-concurrency", help="NLEL label expansion: serial | threads | batch | auto"),
     # Output
     outdir: str = typer.Option("./runs", "--outdir"),
+    resume: bool = typer.Option(False, "--resume", help="Continue the latest matching run in --outdir, skipping finished item ids"),
 ):
     """
     Runs a compute-constrained pilot with split-role models:
@@ -51,6 +53,16 @@ def main(
     _NLEL_MOD.LEDGER_MAX_ROWS = ledger_max_rows
     ensure_dir(outdir)
     ts = now_ts()
+    run_glob = f"{benchmark}.splitrole.*.seed{seed}.n{limit}.bm{budget_multiplier}.nlel.jsonl"
+    if resume:
+        import glob
+        prior = sorted(glob.glob(os.path.join(outdir, run_glob)))
+        if prior: ts = os.path.basename(prior[-1]).split(".")[2]
+    run_tag = f"{benchmark}.splitrole.{ts}.seed{seed}.n{limit}.bm{budget_multiplier}"
+    jsonl_tot = os.path.join(outdir, f"{run_tag}.tot.jsonl")
+    jsonl_nl  = os.path.join(outdir, f"{run_tag}.nlel.jsonl")
+    done_tot = completed_keys(jsonl_tot, ("id",)) if resume else set()
+    done_nl = completed_keys(jsonl_nl, ("id",)) if resume else set()
 
     # Instantiate models
     model_reasoner = get_model(reasoner_model)
@@ -66,31 +78,24 @@ def main(
     loader = get_loader(benchmark)
     budget_tokens = int(8000 * float(budget_multiplier))
 
-    rows_tot: List[Dict[str, Any]] = []
-    rows_nlel: List[Dict[str, Any]] = []
-
-    # Iterate items (single seed)
-    for i, item in enumerate(loader(split="test")):
-        if limit is not None and i >= limit: break
-        q = item["question"]; gold = item["answer"]
-
-        # ToT baseline (reasoner-only)
-        tot_params = ToTParams()
-        res_tot = run_tot(task=q, gold_answer=gold, model=model_reasoner, budget_tokens=budget_tokens, params=tot_params, with_verifier=False, verifier=None)
-        rows_tot.append({"id": item["id"], **res_tot})
+    # Iterate items (single seed); rows are appended as they finish
+    with JsonlAppender(jsonl_tot, append=resume) as out_tot, JsonlAppender(jsonl_nl, append=resume) as out_nl:
+        for i, item in enumerate(loader(split="test")):
+            if limit is not None and i >= limit: break
+            q = item["question"]; gold = item["answer"]
 
-        # NLEL (split-role; reasoner + Λ/Ψ + verifier)
-        res_nlel = run_instance(task=q, gold_answer=gold, model=model_reasoner, budget_tokens=budget_tokens,
-                                labeller=labeller, tuner=tuner, verifier=verifier, ignore_verifier_control=False)
-        rows_nlel.append({"id": item["id"], **res_nlel})
+            # ToT baseline (reasoner-only)
+            if (str(item["id"]),) not in done_tot:
+                tot_params = ToTParams()
+                res_tot = run_tot(task=q, gold_answer=gold, model=model_reasoner, budget_tokens=budget_tokens, params=tot_params, with_verifier=False, verifier=None)
+                out_tot.write({"id": item["id"], **res_tot})
 
-    # Save outputs
-    ensure_dir(outdir)
-    run_tag = f"{benchmark}.splitrole.{ts}.seed{seed}.n{len(rows_nlel)}.bm{budget_multiplier}"
-    jsonl_tot = os.path.join(outdir, f"{run_tag}.tot.jsonl")
-    jsonl_nl  = os.path.join(outdir, f"{run_tag}.nlel.jsonl")
-    safe_jsonl_write(jsonl_tot, rows_tot)
-    safe_jsonl_write(jsonl_nl, rows_nlel)
+            # NLEL (split-role; reasoner + Λ/Ψ + verifier)
+            if (str(item["id"]),) not in done_nl:
+                res_nlel = run_instance(task=q, gold_answer=gold, model=model_reasoner, budget_tokens=budget_tokens,
+                                        labeller=labeller, tuner=tuner, verifier=verifier, ignore_verifier_control=False, label_concurrency=label_concurrency)
+                out_nl.write({"id": item["id"], **res_nlel})
+    rows_tot = read_jsonl(jsonl_tot); rows_nlel = read_jsonl(jsonl_nl)
 
     # Summaries
     def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -3,7 +3,6 @@ import subprocess, sys, os, json
 from pathlib import Path
 import typer
 from typing import Optional, List
-from ..eval.postprocess_pilot_v2.py import main as postprocess_main  # type: ignore
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
 
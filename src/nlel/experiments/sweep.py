@@ -0,0 +1,245 @@
+"""
+Sweeps over a SQLite work queue.
+
+A sweep spec (JSON, or YAML when PyYAML is installed) expands into one work unit per
+model × benchmark × controller × seed × item × budget (with "anytime": true, one unit per item carries
+all budgets, see controllers.anytime; tot/nlel then need "no_budget_guard": true in options). Workers on
+any host that can open the database lease units, keep their lease alive with heartbeats, run them through
+run_experiment.run_item and store the result rows.
+Units whose worker died come back once their lease expires; failed units are retried up to
+--max-attempts times.
+
+  python -m nlel.experiments.sweep enqueue --spec sweep.json --db runs/sweep.sqlite
+  python -m nlel.experiments.sweep worker  --db runs/sweep.sqlite --procs 4      # on each host
+  python -m nlel.experiments.sweep status  --db runs/sweep.sqlite
+  python -m nlel.experiments.sweep collect --db runs/sweep.sqlite --outdir runs/sweep
+
+Spec keys: name, models (or model), benchmarks, controllers, budgets, seeds (default: the preregistered
+seeds), limit, split, anytime, options (run_experiment options by their opts name, e.g.
+{"label_concurrency": "batch", "frontier_width": 2}).
+
+The database uses SQLite's default rollback journal (not WAL) so several hosts can share it over a
+network filesystem that supports file locks.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json, os, socket, sqlite3, threading, time, uuid
+import typer
+from rich import print
+from rich.table import Table
+from ..config import DEFAULT_SEEDS
+from ..utils import ensure_dir, safe_jsonl_write
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+SPEC_KEYS = ("name", "model", "models", "benchmarks", "controllers", "budgets", "seeds", "limit", "split", "anytime", "options")
+
+def load_spec(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as e:
+                raise RuntimeError("YAML sweep specs need PyYAML; use a .json spec instead.") from e
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    unknown = set(spec).difference(SPEC_KEYS)
+    if unknown: raise ValueError(f"Unknown sweep spec keys: {sorted(unknown)}")
+    return spec
+
+def expand(spec: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(unit key, payload) for every work unit of a spec; the key makes re-enqueueing a spec idempotent."""
+    from ..data.loaders import get_loader
+    from .run_experiment import ANYTIME_GUARD_ERROR, BUDGETED, CONTROLLERS, RUN_DEFAULTS
+    options = dict(spec.get("options") or {})
+    unknown = set(options).difference(RUN_DEFAULTS)
+    if unknown: raise ValueError(f"Unknown run options in sweep spec: {sorted(unknown)}")
+    controllers = list(spec["controllers"])
+    for c in controllers:
+        if c not in CONTROLLERS: raise ValueError(f"Unsupported controller: {c}")
+    if spec.get("anytime") and not options.get("no_budget_guard") and any(c in BUDGETED for c in controllers):
+        raise ValueError(f'{ANYTIME_GUARD_ERROR} (set "no_budget_guard": true in options)')
+    models = spec.get("models") or [spec.get("model", "dummy:tiny")]
+    budgets = tuple(float(b) for b in spec.get("budgets", [1.0])); seeds = [int(s) for s in spec.get("seeds", DEFAULT_SEEDS)]
+    groups = [budgets] if spec.get("anytime") else [(b,) for b in budgets]
+    name = spec.get("name", "sweep"); split = spec.get("split", "test")
+    units = []
+    for benchmark in spec["benchmarks"]:
+        opts = {**RUN_DEFAULTS, **options, "benchmark": benchmark}
+        items = list(get_loader(benchmark)(split=split, subset=spec.get("limit")))
+        for model in models:
+            for controller in controllers:
+                for seed in seeds:
+                    for ex in items:
+                        for bmults in groups:
+                            key = json.dumps([name, model, benchmark, controller, seed, ex["id"], bmults])
+                            units.append((key, {"model": model, "controller": controller, "seed": seed, "bmults": bmults, "example": ex, "opts": opts}))
+    return units
+
+class WorkQueue:
+    """
+    Work units in one SQLite table. status: pending -> leased -> done | failed; a lease that is not renewed
+    by `heartbeat` before it expires makes the unit leasable again. One instance per thread.
+    """
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: ensure_dir(d)
+        self.conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout = 60000")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS units (
+            id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, lease_expires REAL, result TEXT, error TEXT, updated REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS units_status ON units (status, lease_expires)")
+    def enqueue(self, units: List[Tuple[str, Dict[str, Any]]]) -> int:
+        now = time.time(); self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+            self.conn.executemany("INSERT OR IGNORE INTO units (key, payload, updated) VALUES (?, ?, ?)", [(k, json.dumps(p, ensure_ascii=False), now) for k, p in units])
+            added = self.conn.execute("SELECT COUNT(*) FROM units").fetchone()[0] - before
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK"); raise
+        return added
+    def lease(self, owner: str, lease_s: float, max_attempts: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+        now = time.time(); self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Units out of attempts (their last worker died, or --max-attempts was lowered) will not run again.
+            self.conn.execute("""UPDATE units SET status = 'failed', error = COALESCE(error, 'lease expired'), updated = ?
+                                 WHERE attempts >= ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))""", (now, max_attempts, now))
+            row = self.conn.execute("""SELECT id, payload FROM units WHERE attempts < ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                                       ORDER BY id LIMIT 1""", (max_attempts, now)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE units SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                                  (owner, now + lease_s, now, row[0]))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK"); raise
+        return (row[0], json.loads(row[1])) if row is not None else None
+    def heartbeat(self, unit_id: int, owner: str, lease_s: float) -> bool:
+        cur = self.conn.execute("UPDATE units SET lease_expires = ?, updated = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                                (time.time() + lease_s, time.time(), unit_id, owner))
+        return cur.rowcount == 1
+    def complete(self, unit_id: int, owner: str, rows: List[Dict[str, Any]]) -> bool:
+        cur = self.conn.execute("UPDATE units SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                                (json.dumps(rows, ensure_ascii=False), time.time(), unit_id, owner))
+        return cur.rowcount == 1
+    def fail(self, unit_id: int, owner: str, error: str, max_attempts: int) -> None:
+        self.conn.execute("""UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, lease_expires = NULL, updated = ?
+                             WHERE id = ? AND owner = ? AND status = 'leased'""", (max_attempts, error, time.time(), unit_id, owner))
+    def open_units(self) -> int:
+        """Units not yet done or failed."""
+        return self.conn.execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'leased')").fetchone()[0]
+    def counts(self) -> List[Tuple[str, str, str, int]]:
+        rows = self.conn.execute("SELECT key, status FROM units").fetchall(); out: Dict[Tuple[str, str, str], int] = {}
+        for key, status in rows:
+            _, _, benchmark, controller, _, _, bmults = json.loads(key)
+            k = (f"{benchmark} · {controller}", ",".join(f"{b:g}" for b in bmults), status); out[k] = out.get(k, 0) + 1
+        return [(*k, n) for k, n in sorted(out.items())]
+    def results(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        return [(key, json.loads(result)) for key, result in self.conn.execute("SELECT key, result FROM units WHERE status = 'done' ORDER BY id")]
+    def errors(self, limit: int = 5) -> List[Tuple[str, int, str]]:
+        return self.conn.execute("SELECT key, attempts, error FROM units WHERE status = 'failed' ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+class _Heartbeat:
+    """Renews a unit's lease from a background thread (with its own connection) while the unit runs."""
+    def __init__(self, db: str, unit_id: int, owner: str, lease_s: float):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(db, unit_id, owner, lease_s), daemon=True)
+    def _run(self, db: str, unit_id: int, owner: str, lease_s: float):
+        queue = WorkQueue(db)
+        while not self._stop.wait(max(1.0, lease_s / 3)):
+            if not queue.heartbeat(unit_id, owner, lease_s): break
+        queue.conn.close()
+    def __enter__(self): self._thread.start(); return self
+    def __exit__(self, *exc): self._stop.set(); self._thread.join()
+
+def work(db: str, lease_s: float = 300.0, max_attempts: int = 3, poll_s: float = 5.0, wait: bool = True) -> int:
+    """
+    Lease and run units until none is left to run; returns how many this worker completed. Models are loaded
+    once per (model, tokenizer) and controller roles kept per (model, benchmark, controller, seed, budgets,
+    opts), as in run_experiment. wait=True keeps polling while other workers hold leases, in case they expire.
+    """
+    from ..models.base import get_model
+    from .run_experiment import build_roles, run_item
+    import traceback
+    queue = WorkQueue(db); owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    models: Dict[Tuple[str, Optional[str]], Any] = {}; roles: Dict[str, Dict[str, Any]] = {}; done = 0
+    while True:
+        leased = queue.lease(owner, lease_s, max_attempts)
+        if leased is None:
+            if not wait or queue.open_units() == 0: return done
+            time.sleep(poll_s); continue
+        unit_id, p = leased; opts = p["opts"]; bmults = tuple(p["bmults"])
+        try:
+            with _Heartbeat(db, unit_id, owner, lease_s):
+                mkey = (p["model"], opts.get("tokenizer"))
+                if mkey not in models: models[mkey] = get_model(p["model"], tokenizer=opts.get("tokenizer"))
+                rkey = json.dumps([p["model"], p["controller"], p["seed"], bmults, opts], sort_keys=True)
+                if rkey not in roles: roles[rkey] = build_roles(p["controller"], models[mkey], opts)
+                rows = run_item(p["controller"], p["example"], p["seed"], bmults, models[mkey], roles[rkey], opts)
+            for r in rows: r["model"] = p["model"]
+            if queue.complete(unit_id, owner, rows): done += 1
+        except Exception:
+            queue.fail(unit_id, owner, traceback.format_exc(limit=8), max_attempts)
+
+@app.command()
+def enqueue(
+    spec: str = typer.Option(..., help="Sweep spec (.json, or .yaml with PyYAML)"),
+    db: str = typer.Option(..., help="SQLite queue file"),
+):
+    """Expand a sweep spec into work units; units already in the queue are left as they are."""
+    units = expand(load_spec(spec))
+    added = WorkQueue(db).enqueue(units)
+    print(f"[bold]Enqueued:[/bold] {added} new of {len(units)} units -> {db}")
+
+@app.command()
+def worker(
+    db: str = typer.Option(..., help="SQLite queue file"),
+    procs: int = typer.Option(1, "--procs", help="Worker processes on this host"),
+    lease_s: float = typer.Option(300.0, "--lease-s", help="Lease length in seconds; renewed every third of it while a unit runs"),
+    max_attempts: int = typer.Option(3, "--max-attempts", help="Attempts per unit before it is marked failed"),
+    poll_s: float = typer.Option(5.0, "--poll-s", help="Seconds between polls while other workers hold the remaining units"),
+    wait: bool = typer.Option(True, "--wait/--no-wait", help="Keep polling until every unit is done or failed (leases of dead workers expire)"),
+):
+    """Run units from the queue until it is drained."""
+    if procs <= 1:
+        n = work(db, lease_s, max_attempts, poll_s, wait)
+    else:
+        import multiprocessing as mp
+        with mp.get_context("spawn").Pool(processes=procs) as pool:
+            n = sum(pool.starmap(work, [(db, lease_s, max_attempts, poll_s, wait)] * procs))
+    print(f"[bold]Worker done:[/bold] {n} units completed")
+
+@app.command()
+def status(db: str = typer.Option(..., help="SQLite queue file")):
+    """Unit counts per benchmark · controller, budgets and status, plus the first failures."""
+    queue = WorkQueue(db)
+    table = Table(title=f"Sweep queue: {db}")
+    for col in ("Run", "Budgets", "Status", "Units"): table.add_column(col, justify="right" if col == "Units" else "left")
+    for run, budgets, st, n in queue.counts(): table.add_row(run, budgets, st, str(n))
+    print(table)
+    for key, attempts, error in queue.errors():
+        print(f"[red]failed[/red] {key} after {attempts} attempts: {(error or '').strip().splitlines()[-1] if error else ''}")
+
+@app.command()
+def collect(
+    db: str = typer.Option(..., help="SQLite queue file"),
+    outdir: str = typer.Option(..., help="Output directory for JSONL and CSV files"),
+):
+    """Write the finished rows as <benchmark>_<controller>.jsonl with per-run and aggregate CSVs, as run_experiment does."""
+    from ..eval.metrics import summarize
+    ensure_dir(outdir); by_run: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for key, rows in WorkQueue(db).results():
+        _, _, benchmark, controller, _, _, _ = json.loads(key)
+        by_run.setdefault((benchmark, controller), []).extend(rows)
+    for (benchmark, controller), rows in sorted(by_run.items()):
+        stem = os.path.join(outdir, f"{benchmark}_{controller}")
+        safe_jsonl_write(f"{stem}.jsonl", rows)
+        per_df, agg_df = summarize(rows)
+        try:
+            per_df.to_csv(f"{stem}_perrun.csv", index=False); agg_df.to_csv(f"{stem}_aggregate.csv", index=False)
+        except Exception: pass
+        print(f"[bold]{benchmark} · {controller}:[/bold] {len(rows)} rows -> {stem}.jsonl")
+
+if __name__ == "__main__":
+    app()
@@ -1,13 +1,46 @@
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional
+from collections import deque
+import json, os
+LEDGER_STYLES = ("full", "compact")
 class Ledger:
-    def __init__(self, max_rows: int = 32):
-        self.max_rows = max_rows; self.rows: List[Dict[str, Any]] = []
+    """
+    Ring buffer of the last `max_rows` tuner outcome rows. Each row is rendered to its prompt line once,
+    when added, so `render_block` is a join of cached strings (itself cached until the next add).
+    `version` counts adds; anything derived from the ledger can compare it to detect changes.
+
+    style="full" renders rows as before (the row dict); "compact" writes one short line per row with only
+    the Π fields that differ from Π₀ and rounded numbers, to spend fewer prompt tokens.
+    Env: NLEL_LEDGER_STYLE (default "full").
+    """
+    def __init__(self, max_rows: int = 32, style: Optional[str] = None, p0: Optional[Dict[str, Any]] = None):
+        self.max_rows = max_rows; self.style = style or os.getenv("NLEL_LEDGER_STYLE", "full")
+        if self.style not in LEDGER_STYLES: raise ValueError(f"Unsupported ledger style: {self.style}")
+        if p0 is None:
+            from ..config import DEFAULT_P0 as p0
+        self.p0 = p0
+        self.rows: deque = deque(maxlen=max_rows); self._lines: deque = deque(maxlen=max_rows)
+        self.version = 0; self._block: Optional[str] = None
     def add(self, row: Dict[str, Any]):
-        self.rows.append(row)
-        if len(self.rows) > self.max_rows: self.rows = self.rows[-self.max_rows:]
+        self.rows.append(row); self._lines.append(self._render_row(row))
+        self.version += 1; self._block = None
+    def _render_row(self, r: Dict[str, Any]) -> str:
+        if self.style == "full":
+            return str({"L": r.get("L"), "Π": r.get("Pi"), "µ": r.get("mu"), "σ": r.get("sigma"), "accept": r.get("accept"), "cost": r.get("cost")})
+        pi = {k: _round(v) for k, v in (r.get("Pi") or {}).items() if _round(v) != _round(self.p0.get(k))}
+        cost = r.get("cost") or {}
+        tokens = int(cost.get("prompt_tokens", 0)) + int(cost.get("completion_tokens", 0)) if isinstance(cost, dict) else cost
+        parts = [str(r.get("L")), json.dumps(pi, ensure_ascii=False, separators=(",", ":")) if pi else "Π₀",
+                 f"µ={_round(r.get('mu'))} σ={_round(r.get('sigma'))}", f"tok={tokens}"]
+        if r.get("accept") is not None: parts.append(f"accept={int(bool(r.get('accept')))}")
+        return " | ".join(parts)
     def render_block(self) -> str:
-        if not self.rows: return "(empty)"
-        out = []
-        for r in self.rows[-self.max_rows:]:
-            out.append(str({"L": r.get("L"), "Π": r.get("Pi"), "µ": r.get("mu"), "σ": r.get("sigma"), "accept": r.get("accept"), "cost": r.get("cost")}))
-        return "\n".join(out)
+        if not self._lines: return "(empty)"
+        if self._block is None:
+            head = ["L | Π changes vs Π₀ | µ σ | tokens"] if self.style == "compact" else []
+            self._block = "\n".join(head + list(self._lines))
+        return self._block
+
+def _round(v: Any) -> Any:
+    if isinstance(v, float): return round(v, 3)
+    if isinstance(v, dict): return {k: _round(x) for k, x in v.items()}
+    return v
@@ -1,19 +1,63 @@
 from typing import List, Dict, Any, Optional, Tuple
-import os, json
-from ..tokens import approx_tokens
+import os, re, json, time, asyncio, functools, weakref
+from ..tokens import TokenCounter, get_token_counter
+
+# A final-answer line with some content, closed by a newline. Backends honouring the `stop_on_final_answer`
+# decode kwarg end the completion right after it.
+_FINAL_LINE = re.compile(r"Final Answer:[^\n]*\S[^\n]*\n")
+
+def final_answer_end(text: str) -> int:
+    """Index just past the newline that completes the first 'Final Answer:' line, or -1."""
+    m = _FINAL_LINE.search(text); return m.end() if m else -1
 
 class TextModel:
+    native_batch = False  # True when batch_generate/generate_many run as one backend call rather than a loop
+    max_concurrency = int(os.getenv("NLEL_MAX_CONCURRENCY", "16"))  # in-flight async calls per model instance
+    tokenizer: Optional[str] = None  # counter spec for token counts the backend estimates itself (see tokens.get_token_counter)
+    def token_counter(self) -> TokenCounter:
+        return get_token_counter(self.tokenizer)
     def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
         raise NotImplementedError
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One semaphore per (model, event loop); asyncio primitives are bound to the loop that first awaits them.
+        sems = self.__dict__.setdefault("_async_sems", weakref.WeakKeyDictionary())
+        loop = asyncio.get_running_loop()
+        if loop not in sems: sems[loop] = asyncio.Semaphore(max(1, int(self.max_concurrency)))
+        return sems[loop]
+    async def _agenerate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        """Override with a native async call; the default runs the blocking `generate` in the loop's executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.generate, prompt, **decode_kwargs))
+    async def agenerate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        async with self._semaphore():
+            return await self._agenerate(prompt, **decode_kwargs)
+    async def abatch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        if self.native_batch:
+            # The whole batch is one backend call and takes one slot of the concurrency limit.
+            async with self._semaphore():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, functools.partial(self.batch_generate, prompts, **decode_kwargs))
+        return list(await asyncio.gather(*(self.agenerate(p, **decode_kwargs) for p in prompts)))
+    async def aclose(self) -> None:
+        """
+        Close the async clients bound to the running event loop. Await it before the loop ends (last thing in
+        the coroutine given to `asyncio.run`); the next loop opens fresh clients.
+        """
     def batch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
         return [self.generate(p, **decode_kwargs) for p in prompts]
+    def generate_many(self, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Generate for (prompt, decode_kwargs) pairs whose decode settings may differ per row."""
+        return [self.generate(p, **kw) for p, kw in requests]
 
 class DummyModel(TextModel):
-    def __init__(self, mode: str = "tiny"):
-        self.mode = mode
+    def __init__(self, mode: str = "tiny", tokenizer: Optional[str] = None):
+        self.mode = mode; self.tokenizer = tokenizer
     def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
         import json
-        if 'Emit **JSON only**' in prompt or 'JSON object' in prompt:
+        if 'Emit a **JSON array only**' in prompt:
+            cv = {"temperature":0.2,"top_p":0.9,"max_tokens":64,"repetition_penalty":1.0,"gen_count":2,"branch_quota":2,"beta":0.15,"verify_passes":1,"verify_strictness":0.5,"retrieval_weights":{"general":0.0,"math-lemmas":0.0}}
+            s = json.dumps([{"label": L, "controls": cv} for L in ("work backward", "seek a counterexample", "call retrieval; summarize first")])
+        elif 'Emit **JSON only**' in prompt or 'JSON object' in prompt:
             s = json.dumps({"temperature":0.2,"top_p":0.9,"max_tokens":64,"repetition_penalty":1.0,"gen_count":2,"branch_quota":2,"beta":0.15,"verify_passes":1,"verify_strictness":0.5,"retrieval_weights":{"general":0.0,"math-lemmas":0.0}})
         elif 'edge labels' in prompt and 'Emit up to' in prompt:
             s = "work backward; seek a counterexample; call retrieval; summarize first"
@@ -25,15 +69,26 @@ class DummyModel(TextModel):
             s = "Reasoning...\nFinal Answer: 42"
         else:
             s = "Thought: try a simpler sub-problem."
-        usage = {"prompt_tokens": approx_tokens(prompt), "completion_tokens": approx_tokens(s)}
-        return s, {"usage": usage}
+        n_prompt, n_completion = self.token_counter().count_many([prompt, s])
+        return s, {"usage": {"prompt_tokens": n_prompt, "completion_tokens": n_completion}}
 
 class OpenAIChatModel(TextModel):
-    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None, max_concurrency: Optional[int] = None, tokenizer: Optional[str] = None):
         from openai import OpenAI
         api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.client = OpenAI(api_key=api_key, base_url=base_url); self.model = model
-    def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        self._api_key = api_key; self._base_url = base_url; self._aclients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        if max_concurrency: self.max_concurrency = int(max_concurrency)
+        self.tokenizer = tokenizer or os.getenv("NLEL_TOKENIZER") or f"tiktoken:{model}"; self._counter: Optional[TokenCounter] = None
+    def token_counter(self) -> TokenCounter:
+        if self._counter is None:
+            try:
+                self._counter = get_token_counter(self.tokenizer)
+            except Exception:
+                # tiktoken missing, or a served model it has no encoding for.
+                self._counter = get_token_counter("approx")
+        return self._counter
+    def _params(self, prompt: str, decode_kwargs: Dict[str, Any]) -> Dict[str, Any]:
         messages=[{"role":"user","content":prompt}]
         params = dict(model=self.model, messages=messages)
         if "temperature" in decode_kwargs: params["temperature"]=decode_kwargs["temperature"]
@@ -42,27 +97,94 @@ class OpenAIChatModel(TextModel):
         if "repetition_penalty" in decode_kwargs:
             rp = float(decode_kwargs["repetition_penalty"])
             params["frequency_penalty"] = max(-2.0, min(2.0, 1.0 - rp))
-        resp = self.client.chat.completions.create(**params)
+        return params
+    @staticmethod
+    def _result(resp) -> Tuple[str, Dict[str, Any]]:
         msg = resp.choices[0].message.content or ""
         usage = {"prompt_tokens": getattr(resp.usage, "prompt_tokens", 0), "completion_tokens": getattr(resp.usage, "completion_tokens", 0)}
         return msg, {"usage": usage}
+    @staticmethod
+    def _stream_step(state: Dict[str, Any], chunk) -> bool:
+        """Fold one stream chunk into `state`; True once the final-answer line is complete."""
+        if getattr(chunk, "usage", None) is not None: state["usage"] = chunk.usage
+        for choice in chunk.choices or []:
+            delta = getattr(choice.delta, "content", None) or ""
+            if delta:
+                if not state["parts"]: state["ttft"] = time.perf_counter() - state["t0"]
+                state["parts"].append(delta); state["chunks"] += 1
+            if delta and "\n" in delta:
+                end = final_answer_end("".join(state["parts"]))
+                if end >= 0: state["end"] = end; return True
+        return False
+    def _stream_result(self, prompt: str, state: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        text = "".join(state["parts"])
+        if state["end"] >= 0: text = text[:state["end"]]
+        u = state["usage"]; timing = {"ttft_s": state["ttft"]} if state["ttft"] is not None else {}
+        if u is not None:
+            return text, {"usage": {"prompt_tokens": getattr(u, "prompt_tokens", 0), "completion_tokens": getattr(u, "completion_tokens", 0)}, **timing}
+        # Stopped before the server's final usage chunk: content chunks carry about one token each.
+        return text, {"usage": {"prompt_tokens": self.token_counter().count(prompt), "completion_tokens": state["chunks"]}, "usage_estimated": True, "early_stop": True, **timing}
+    def _stream_params(self, prompt: str, decode_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(self._params(prompt, decode_kwargs), stream=True, stream_options={"include_usage": True})
+    def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        if decode_kwargs.get("stop_on_final_answer"):
+            # Stream and close the connection once the final-answer line is complete.
+            state = {"parts": [], "chunks": 0, "end": -1, "usage": None, "t0": time.perf_counter(), "ttft": None}
+            stream = self.client.chat.completions.create(**self._stream_params(prompt, decode_kwargs))
+            try:
+                for chunk in stream:
+                    if self._stream_step(state, chunk): break
+            finally:
+                stream.close()
+            return self._stream_result(prompt, state)
+        resp = self.client.chat.completions.create(**self._params(prompt, decode_kwargs))
+        return self._result(resp)
+    def _aclient(self):
+        # One AsyncOpenAI per event loop, like the semaphores: its pooled connections belong to the loop that opened them.
+        loop = asyncio.get_running_loop(); client = self._aclients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = self._aclients[loop] = AsyncOpenAI(api_key=self._api_key, base_url=self._base_url)
+        return client
+    async def aclose(self) -> None:
+        client = self._aclients.pop(asyncio.get_running_loop(), None)
+        if client is not None: await client.close()
+    async def _agenerate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        client = self._aclient()
+        if decode_kwargs.get("stop_on_final_answer"):
+            state = {"parts": [], "chunks": 0, "end": -1, "usage": None, "t0": time.perf_counter(), "ttft": None}
+            stream = await client.chat.completions.create(**self._stream_params(prompt, decode_kwargs))
+            try:
+                async for chunk in stream:
+                    if self._stream_step(state, chunk): break
+            finally:
+                await stream.close()
+            return self._stream_result(prompt, state)
+        resp = await client.chat.completions.create(**self._params(prompt, decode_kwargs))
+        return self._result(resp)
 
-def get_model(spec: str):
+def get_model(spec: str, tokenizer: Optional[str] = None):
     """Resolve a model spec into a TextModel.
 
     Supported:
       - "hf:<model_or_path>" or "local:<...>" — Hugging Face Transformers (offline by default)
       - "dummy:<mode>" — test stub
+      - "cache:<spec>" — any of the above behind a persistent generation cache (see models.cache)
 
-    No external APIs are used by this resolver.
+    tokenizer: token counter spec for backends that count tokens themselves (dummy); HF models always use
+    their own tokenizer. No external APIs are used by this resolver.
     """
     if ":" in spec:
         kind, name = spec.split(":", 1)
     else:
         kind, name = "dummy", spec
 
+    if kind == "cache":
+        from .cache import CachedTextModel
+        # Dummy usage is counted by the tokenizer, so it is part of what a cached generation depends on.
+        return CachedTextModel(get_model(name, tokenizer=tokenizer), spec=f"{name}|{tokenizer}" if tokenizer else name)
     if kind == "dummy":
-        return DummyModel(mode=name)
+        return DummyModel(mode=name, tokenizer=tokenizer)
     if kind in ("hf", "local", "transformers"):
         from .hf_local import HFLocalTextModel
         return HFLocalTextModel(model_name_or_path=name, local_files_only=True)
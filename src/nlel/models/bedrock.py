@@ -1,10 +1,14 @@
 from typing import Tuple, Dict, Any, Optional
-import os, json
+import os, json, weakref
 from .base import TextModel
 try:
     import boto3  # type: ignore
 except Exception:
     boto3 = None
+try:
+    from aiobotocore.session import get_session as _aio_session  # type: ignore
+except Exception:
+    _aio_session = None
 
 class BedrockTextModel(TextModel):
     """
@@ -13,14 +17,19 @@ class BedrockTextModel(TextModel):
     Environment:
       - AWS_REGION (or explicit region_name kwarg)
       - BEDROCK_PROVIDER (optional: 'anthropic'|'cohere'|'meta'), else inferred from modelId prefix
+
+    `agenerate` is natively async when aiobotocore is installed, else it runs `generate` in a thread; await
+    `aclose()` before the event loop ends to close the loop's aiobotocore client.
     """
-    def __init__(self, model_id: str, region_name: Optional[str] = None, provider: Optional[str] = None):
+    def __init__(self, model_id: str, region_name: Optional[str] = None, provider: Optional[str] = None, max_concurrency: Optional[int] = None):
         self.model_id = model_id
         self.region_name = region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
         self.provider = provider or self._infer_provider(model_id)
         if boto3 is None:
             raise RuntimeError("boto3 is required for BedrockTextModel but is not installed.")
         self.client = boto3.client("bedrock-runtime", region_name=self.region_name)
+        self._aclients = weakref.WeakKeyDictionary()  # event loop -> future of its aiobotocore client
+        if max_concurrency: self.max_concurrency = int(max_concurrency)
 
     def _infer_provider(self, model_id: str) -> str:
         if model_id.startswith("anthropic."): return "anthropic"
@@ -37,6 +46,36 @@ class BedrockTextModel(TextModel):
         NOTE: Bedrock providers each have their own schema; this adapter covers Anthropic Claude 3 and Cohere Command-R.
               For others, adjust the payload mapping below.
         """
+        body = self._body(prompt, decode_kwargs)
+        resp = self.client.invoke_model(modelId=self.model_id, body=json.dumps(body))
+        raw = resp.get("body")
+        if hasattr(raw, "read"):
+            return self._parse(raw.read().decode("utf-8"))
+        return self._parse(raw or {})
+
+    async def _agenerate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        if _aio_session is None:
+            return await super()._agenerate(prompt, **decode_kwargs)
+        import asyncio
+        loop = asyncio.get_running_loop()
+        opening = self._aclients.get(loop)
+        if opening is None:
+            # Entered here and exited by `aclose`, so one client (and its connection pool) serves the whole loop;
+            # the future is cached so concurrent first calls wait on the same client.
+            opening = self._aclients[loop] = asyncio.ensure_future(_aio_session().create_client("bedrock-runtime", region_name=self.region_name).__aenter__())
+        client = await opening
+        resp = await client.invoke_model(modelId=self.model_id, body=json.dumps(self._body(prompt, decode_kwargs)))
+        raw = resp.get("body")
+        if hasattr(raw, "read"):
+            return self._parse((await raw.read()).decode("utf-8"))
+        return self._parse(raw or {})
+
+    async def aclose(self) -> None:
+        import asyncio
+        opening = self._aclients.pop(asyncio.get_running_loop(), None)
+        if opening is not None: await (await opening).__aexit__(None, None, None)
+
+    def _body(self, prompt: str, decode_kwargs: Dict[str, Any]) -> Dict[str, Any]:
         temperature = float(decode_kwargs.get("temperature", 0.2))
         top_p      = float(decode_kwargs.get("top_p", 0.95))
         max_tokens = int(decode_kwargs.get("max_tokens", 256))
@@ -61,20 +100,20 @@ class BedrockTextModel(TextModel):
         else:
             # Generic fallback
             body = {"prompt": prompt, "max_tokens": max_tokens, "temperature": temperature}
+        return body
 
-        resp = self.client.invoke_model(modelId=self.model_id, body=json.dumps(body))
-        raw = resp.get("body")
+    def _parse(self, raw) -> Tuple[str, Dict[str, Any]]:
         text = ""
         usage = {"prompt_tokens": 0, "completion_tokens": 0}
 
-        if hasattr(raw, "read"):
-            raw_text = raw.read().decode("utf-8")
+        if isinstance(raw, str):
+            raw_text = raw
             try:
                 obj = json.loads(raw_text)
             except Exception:
                 return raw_text, {"usage": usage}
         else:
-            obj = raw or {}
+            obj = raw
 
         if self.provider == "anthropic":
             # {"content":[{"type":"text","text":"..."}], "usage":{"input_tokens":..,"output_tokens":..}}
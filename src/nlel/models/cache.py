@@ -0,0 +1,115 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os, json, time, sqlite3, hashlib, threading
+from .base import TextModel
+from ..utils import ensure_dir, current_seed
+
+class GenerationStore:
+    """SQLite-backed (key -> text, meta) store with least-recently-used eviction by payload size."""
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path; self.max_bytes = int(max_bytes); self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, text TEXT NOT NULL, meta TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_lru ON generations(last_used)")
+        self.bytes = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0])
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT text, meta FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            self._conn.execute("UPDATE generations SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0], json.loads(row[1])
+    def put(self, key: str, text: str, meta: Dict[str, Any]) -> None:
+        meta_s = json.dumps(meta, ensure_ascii=False, default=str)
+        size = len(text.encode("utf-8")) + len(meta_s.encode("utf-8")) + len(key)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM generations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?)", (key, text, meta_s, size, time.time()))
+            self.bytes += size - (old[0] if old else 0)
+            if self.bytes > self.max_bytes: self._evict()
+    def _evict(self) -> None:
+        # Drop least-recently-used rows until we are back under 90% of the bound.
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._conn.execute("SELECT key, size FROM generations ORDER BY last_used ASC").fetchall():
+            if self.bytes <= target: break
+            self._conn.execute("DELETE FROM generations WHERE key = ?", (key,)); self.bytes -= size
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0])
+
+class CachedTextModel(TextModel):
+    """
+    Content-addressed cache around any TextModel, keyed on (model spec, prompt, decode kwargs[, seed]).
+
+    Greedy calls (temperature 0, top_p 1) are always cached and shared across seeds. Sampled calls are cached
+    only with cache_sampled=True and a seed fixed via `utils.set_seed`; they are keyed on the seed and on
+    their occurrence index since the last `set_seed`, so repeated identical sampled calls (sibling prompts)
+    stay distinct while a rerun with the same seed replays them in order. Hits return the stored `usage`
+    so token accounting matches the original run; meta carries "cache_hit": True.
+
+    Environment knobs (used by `get_model("cache:<spec>")`):
+      NLEL_CACHE_DIR:     directory for the SQLite file (default ./.nlel_cache)
+      NLEL_CACHE_MAX_MB:  size bound before least-recently-used eviction (default 1024)
+      NLEL_CACHE_SAMPLED: '1' -> also cache sampled calls under a fixed seed
+    """
+    def __init__(self, inner: TextModel, spec: str, cache_dir: Optional[str] = None, max_mb: Optional[float] = None, cache_sampled: Optional[bool] = None):
+        self.inner = inner; self.spec = spec
+        self.native_batch = getattr(inner, "native_batch", False)
+        cache_dir = cache_dir or os.getenv("NLEL_CACHE_DIR") or ".nlel_cache"; ensure_dir(cache_dir)
+        max_mb = float(max_mb if max_mb is not None else (os.getenv("NLEL_CACHE_MAX_MB") or 1024))
+        self.cache_sampled = bool(cache_sampled) if cache_sampled is not None else os.getenv("NLEL_CACHE_SAMPLED", "0") == "1"
+        self.store = GenerationStore(os.path.join(cache_dir, "generations.sqlite"), max_bytes=int(max_mb * 2**20))
+        self.hits = 0; self.misses = 0; self.skipped = 0
+        self._lock = threading.Lock(); self._occurrences: Dict[str, int] = {}; self._epoch = None
+
+    @staticmethod
+    def _sampled(decode_kwargs: Dict[str, Any]) -> bool:
+        return float(decode_kwargs.get("temperature", 0.0)) > 1e-6 or float(decode_kwargs.get("top_p", 1.0)) < 0.999
+
+    def _key(self, prompt: str, decode_kwargs: Dict[str, Any]) -> Optional[str]:
+        decode = {k: v for k, v in decode_kwargs.items() if k != "cache_prefix"}  # hints do not change outputs
+        parts: Dict[str, Any] = {"spec": self.spec, "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(), "decode": decode}
+        if self._sampled(decode_kwargs):
+            seed, epoch = current_seed()
+            if not self.cache_sampled or seed is None: return None
+            base = json.dumps({**parts, "seed": seed}, sort_keys=True, default=str)
+            with self._lock:
+                if epoch != self._epoch: self._occurrences.clear(); self._epoch = epoch
+                n = self._occurrences.get(base, 0); self._occurrences[base] = n + 1
+            parts.update(seed=seed, occurrence=n)
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "uncached": self.skipped, "bytes": self.store.bytes}
+
+    def generate_many(self, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        results: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(requests)
+        keys = [self._key(p, kw) for p, kw in requests]; todo = []
+        for i, key in enumerate(keys):
+            hit = self.store.get(key) if key is not None else None
+            if hit is not None:
+                self.hits += 1; results[i] = (hit[0], {**hit[1], "cache_hit": True})
+            else:
+                if key is None: self.skipped += 1
+                else: self.misses += 1
+                todo.append(i)
+        if todo:
+            kws = [requests[i][1] for i in todo]
+            if all(kw == kws[0] for kw in kws):
+                outs = self.inner.batch_generate([requests[i][0] for i in todo], **kws[0])
+            else:
+                outs = self.inner.generate_many([requests[i] for i in todo])
+            for i, (text, meta) in zip(todo, outs):
+                if keys[i] is not None: self.store.put(keys[i], text, meta)
+                results[i] = (text, meta)
+        return results  # type: ignore[return-value]
+
+    def batch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        return self.generate_many([(p, decode_kwargs) for p in prompts])
+
+    def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        return self.generate_many([(prompt, decode_kwargs)])[0]
+
+    def token_counter(self):
+        return self.inner.token_counter()
+    async def aclose(self) -> None:
+        await self.inner.aclose()
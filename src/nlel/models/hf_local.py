@@ -1,17 +1,41 @@
 
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, List
 import os
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
+from .prefix_cache import PrefixKVCache, common_prefix_len, fork_past
 
 # Expect TextModel base in same package
 try:
-    from .base import TextModel
+    from .base import TextModel, final_answer_end
 except Exception:
     # Minimal shim if base imports later
     class TextModel:
         def generate(self, prompt: str, **kwargs):
             raise NotImplementedError
+    def final_answer_end(text: str) -> int:
+        import re; m = re.search(r"Final Answer:[^\n]*\S[^\n]*\n", text); return m.end() if m else -1
+
+class FinalAnswerStop(StoppingCriteria):
+    """
+    Per-row stop once the 'Final Answer:' line is complete. Each step decodes only a short tail of the rows
+    still running (from where the marker was first seen, once it has been); `stop_at[row]` records the
+    number of new tokens kept for rows that stopped here.
+    """
+    MARK = "Final Answer:"
+    def __init__(self, tokenizer, prompt_width: int, batch_size: int, window: int = 16):
+        self.tokenizer = tokenizer; self.prompt_width = prompt_width; self.window = window
+        self.mark_at: List[Optional[int]] = [None] * batch_size; self.stop_at: List[Optional[int]] = [None] * batch_size
+    def __call__(self, input_ids, scores, **kwargs):
+        cur = input_ids.shape[1]; done = []
+        for row in range(input_ids.shape[0]):
+            if self.stop_at[row] is not None: done.append(True); continue
+            start = self.mark_at[row] if self.mark_at[row] is not None else max(self.prompt_width, cur - self.window)
+            tail = self.tokenizer.decode(input_ids[row, start:cur], skip_special_tokens=True)
+            if self.mark_at[row] is None and self.MARK in tail: self.mark_at[row] = start; tail = tail[tail.index(self.MARK):]
+            if self.mark_at[row] is not None and final_answer_end(tail) >= 0: self.stop_at[row] = cur - self.prompt_width
+            done.append(self.stop_at[row] is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
 
 class HFLocalTextModel(TextModel):
     """
@@ -22,7 +46,14 @@ class HFLocalTextModel(TextModel):
       HF_LOCAL_DEVICE: 'cuda' | 'cpu' | 'mps' | 'auto' (default 'auto')
       HF_LOCAL_DTYPE:  'auto' | 'float32' | 'float16' | 'bfloat16' (default 'auto')
       HF_USE_4BIT:     '1' -> enable 4-bit quantization (requires bitsandbytes and NVIDIA GPU)
+      HF_MAX_BATCH_SIZE:   max rows per padded generate() call (default 8)
+      HF_MAX_BATCH_TOKENS: max padded tokens (rows x (prompt + max_new_tokens)) per call; 0 = unlimited (default)
+      HF_PREFIX_CACHE_MB:  memory bound for cached prompt-prefix past_key_values; 0 disables (default 256)
+    Decode kwargs beyond the sampling ones: `cache_prefix` (a prompt prefix worth caching, see
+    generate_many) and `stop_on_final_answer`, which ends each row once its 'Final Answer:' line is complete.
     """
+    native_batch = True
+
     def __init__(self,
                  model_name_or_path: str,
                  device: Optional[str] = None,
@@ -30,9 +61,16 @@ class HFLocalTextModel(TextModel):
                  local_files_only: bool = True,
                  load_in_4bit: Optional[bool] = None,
                  device_map: Optional[str] = None,
-                 trust_remote_code: bool = False) -> None:
+                 trust_remote_code: bool = False,
+                 max_batch_size: Optional[int] = None,
+                 max_batch_tokens: Optional[int] = None,
+                 prefix_cache_mb: Optional[float] = None) -> None:
         self.model_name = model_name_or_path
         self.local_files_only = local_files_only
+        self.max_batch_size = max(1, int(max_batch_size or os.getenv("HF_MAX_BATCH_SIZE") or 8))
+        self.max_batch_tokens = int(max_batch_tokens if max_batch_tokens is not None else (os.getenv("HF_MAX_BATCH_TOKENS") or 0))
+        cache_mb = float(prefix_cache_mb if prefix_cache_mb is not None else (os.getenv("HF_PREFIX_CACHE_MB") or 256))
+        self.prefix_cache = PrefixKVCache(max_bytes=int(cache_mb * 2**20)) if cache_mb > 0 else None
 
         dev_pref = (device or os.getenv("HF_LOCAL_DEVICE") or "auto").lower()
         if dev_pref == "auto":
@@ -76,6 +114,8 @@ class HFLocalTextModel(TextModel):
         )
         if self.tokenizer.pad_token_id is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Decoder-only models need left padding so every row's prompt ends at the same position.
+        self.tokenizer.padding_side = "left"
 
         model_kwargs: Dict[str, Any] = dict(
             local_files_only=self.local_files_only,
@@ -108,10 +148,16 @@ class HFLocalTextModel(TextModel):
             self.model.to(self.device)
         self.model.eval()
 
+    def token_counter(self):
+        if getattr(self, "_counter", None) is None:
+            from ..tokens import HFTokenCounter
+            self._counter = HFTokenCounter(self.model_name, tokenizer=self.tokenizer)
+        return self._counter
+
     def _token_count(self, text: str) -> int:
-        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+        return self.token_counter().count(text)
 
-    def generate(self, prompt: str, **decode_kwargs):
+    def _gen_kwargs(self, decode_kwargs: Dict[str, Any]) -> Dict[str, Any]:
         temperature = float(decode_kwargs.get("temperature", 0.0))
         top_p = float(decode_kwargs.get("top_p", 1.0))
         repetition_penalty = float(decode_kwargs.get("repetition_penalty", 1.0))
@@ -119,15 +165,6 @@ class HFLocalTextModel(TextModel):
 
         do_sample = (temperature > 1e-6) or (top_p < 0.999)
 
-        inputs = self.tokenizer(prompt, return_tensors="pt", add_special_tokens=False)
-        input_ids = inputs["input_ids"]
-        attention_mask = inputs.get("attention_mask", None)
-
-        if not self.load_in_4bit and self.device_map is None:
-            input_ids = input_ids.to(self.device)
-            if attention_mask is not None:
-                attention_mask = attention_mask.to(self.device)
-
         gen_kwargs = dict(
             max_new_tokens=max_new_tokens,
             do_sample=do_sample,
@@ -137,19 +174,142 @@ class HFLocalTextModel(TextModel):
             pad_token_id=self.tokenizer.pad_token_id,
             eos_token_id=self.tokenizer.eos_token_id,
         )
-        gen_kwargs = {k: v for k, v in gen_kwargs.items() if v is not None}
+        return {k: v for k, v in gen_kwargs.items() if v is not None}
+
+    def _to_device(self, t):
+        if t is not None and not self.load_in_4bit and self.device_map is None:
+            return t.to(self.device)
+        return t
+
+    def _split_batches(self, rows: List[int], lengths: Dict[int, int], max_new_tokens: int) -> List[List[int]]:
+        """Greedy split of length-sorted rows so each padded batch respects the row and token limits."""
+        batches: List[List[int]] = []; cur: List[int] = []; cur_max = 0
+        for i in sorted(rows, key=lambda r: lengths[r]):
+            new_max = max(cur_max, lengths[i])
+            too_many = len(cur) >= self.max_batch_size
+            too_big = self.max_batch_tokens > 0 and (len(cur) + 1) * (new_max + max_new_tokens) > self.max_batch_tokens
+            if cur and (too_many or too_big):
+                batches.append(cur); cur = []; new_max = lengths[i]
+            cur.append(i); cur_max = new_max
+        if cur: batches.append(cur)
+        return batches
+
+    def _stopper(self, stop: bool, prompt_width: int, batch_size: int) -> Tuple[Dict[str, Any], Optional[FinalAnswerStop]]:
+        if not stop: return {}, None
+        crit = FinalAnswerStop(self.tokenizer, prompt_width, batch_size)
+        return {"stopping_criteria": StoppingCriteriaList([crit])}, crit
+
+    def _generate_padded(self, prompts: List[str], gen_kwargs: Dict[str, Any], stop: bool = False) -> List[Tuple[str, Dict[str, Any]]]:
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False)
+        input_ids = self._to_device(inputs["input_ids"])
+        attention_mask = self._to_device(inputs.get("attention_mask", None))
+        extra, crit = self._stopper(stop, input_ids.shape[1], len(prompts))
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                **gen_kwargs,
+                **extra,
+            )
+
+        prompt_lens = [int(m.sum()) for m in attention_mask] if attention_mask is not None else None
+        return self._decode_rows(outputs, input_ids.shape[1], prompt_lens, crit.stop_at if crit else None)
 
+    def _decode_rows(self, outputs, prompt_width: int, prompt_lens: Optional[List[int]], stop_at: Optional[List[Optional[int]]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        eos_id = self.tokenizer.eos_token_id
+        results = []
+        for row in range(outputs.shape[0]):
+            new_tokens = outputs[row, prompt_width:]
+            # Rows that finish early are padded out to the longest row; count up to (and including) EOS,
+            # or up to the step where the final-answer stop fired for that row.
+            n_new = int(new_tokens.shape[0])
+            if eos_id is not None:
+                hits = (new_tokens == eos_id).nonzero()
+                if len(hits): n_new = int(hits[0, 0]) + 1
+            if stop_at is not None and stop_at[row] is not None: n_new = min(n_new, stop_at[row])
+            completion_text = self.tokenizer.decode(new_tokens[:n_new], skip_special_tokens=True)
+            meta: Dict[str, Any] = {}
+            if stop_at is not None and stop_at[row] is not None:
+                end = final_answer_end(completion_text)
+                if end >= 0: completion_text = completion_text[:end]
+                meta["early_stop"] = True
+            n_prompt = prompt_lens[row] if prompt_lens is not None else prompt_width
+            results.append((completion_text, {"usage": {"prompt_tokens": n_prompt, "completion_tokens": n_new}, **meta}))
+        return results
+
+    def _compute_prefix(self, ids: List[int]):
+        prefix = self._to_device(torch.tensor([ids], dtype=torch.long))
+        with torch.no_grad():
+            out = self.model(input_ids=prefix, use_cache=True)
+        return self.prefix_cache.put(ids, out.past_key_values)
+
+    def _generate_with_prefix(self, prompts: List[str], gen_kwargs: Dict[str, Any], hints: List[Optional[str]], stop: bool = False) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Decode a batch from one shared prompt prefix: its past_key_values are computed once (or taken from
+        the cache), forked per row, and only the rows' suffixes run through the model. The prefix is the
+        rows' common prefix when there are several (computed unless a cached one is as long), else the
+        longest cached prefix or the caller's `cache_prefix` hint. Suffixes of different lengths are padded
+        between prefix and suffix, masked out, so every row's positions continue from the prefix (models
+        take positions from the attention mask, as HF decoder-only models do). None when no prefix applies.
+        """
+        rows = [self.tokenizer(p, add_special_tokens=False).input_ids for p in prompts]
+        min_tokens = self.prefix_cache.min_tokens
+        n = min(common_prefix_len(rows), min(len(r) for r in rows) - 1)  # every row keeps at least one token to decode from
+        if n < min_tokens: return None
+        m, legacy = self.prefix_cache.longest(rows[0][:n + 1])
+        if len(rows) > 1 and n > m:
+            m, legacy = n, self._compute_prefix(rows[0][:n])
+        elif legacy is None and hints[0]:
+            hint_ids = self.tokenizer(hints[0], add_special_tokens=False).input_ids
+            # Token boundaries can merge across the hint's end; only use it if it tokenizes as a true prefix.
+            if min_tokens <= len(hint_ids) <= n and rows[0][:len(hint_ids)] == hint_ids:
+                m, legacy = len(hint_ids), self._compute_prefix(hint_ids)
+        if legacy is None: return None
+
+        prefix = rows[0][:m]; suffixes = [r[m:] for r in rows]; width = max(len(s) for s in suffixes); pad = self.tokenizer.pad_token_id
+        ids = [prefix + [pad] * (width - len(s)) + s for s in suffixes]
+        mask = [[1] * m + [0] * (width - len(s)) + [1] * len(s) for s in suffixes]
+        input_ids = self._to_device(torch.tensor(ids, dtype=torch.long))
+        attention_mask = self._to_device(torch.tensor(mask, dtype=torch.long))
+        extra, crit = self._stopper(stop, m + width, len(rows))
         with torch.no_grad():
             outputs = self.model.generate(
                 input_ids=input_ids,
                 attention_mask=attention_mask,
+                past_key_values=fork_past(legacy, len(rows)),
                 **gen_kwargs,
+                **extra,
             )
+        return self._decode_rows(outputs, m + width, [len(r) for r in rows], crit.stop_at if crit else None)
 
-        new_tokens = outputs[0, input_ids.shape[1]:]
-        completion_text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
-        usage = {
-            "prompt_tokens": int(input_ids.shape[1]),
-            "completion_tokens": int(new_tokens.shape[0]),
-        }
-        return completion_text, {"usage": usage}
+    def generate_many(self, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Padded batch generation. Rows are grouped by decode settings, sorted by prompt length and split
+        into batches of at most max_batch_size rows and max_batch_tokens padded tokens (prompt + new).
+        With the prefix cache on, each batch decodes from its rows' shared prefix (see _generate_with_prefix);
+        an optional `cache_prefix` decode kwarg names a prefix worth caching across calls (e.g. the
+        evaluator's task head, shared by single-row calls of one task).
+        """
+        results: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(requests)
+        groups: Dict[Tuple, List[int]] = {}
+        for i, (_, kw) in enumerate(requests):
+            groups.setdefault((tuple(sorted(self._gen_kwargs(kw).items())), bool(kw.get("stop_on_final_answer"))), []).append(i)
+        lengths = {i: self._token_count(p) for i, (p, _) in enumerate(requests)} if len(requests) > 1 else {0: 0}
+        for (key, stop), rows in groups.items():
+            gen_kwargs = dict(key)
+            for batch in self._split_batches(rows, lengths, gen_kwargs["max_new_tokens"]):
+                prompts = [requests[i][0] for i in batch]
+                outs = None
+                if self.prefix_cache is not None:
+                    outs = self._generate_with_prefix(prompts, gen_kwargs, [requests[i][1].get("cache_prefix") for i in batch], stop)
+                if outs is None:
+                    outs = self._generate_padded(prompts, gen_kwargs, stop)
+                for i, out in zip(batch, outs): results[i] = out
+        return results  # type: ignore[return-value]
+
+    def batch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        return self.generate_many([(p, decode_kwargs) for p in prompts])
+
+    def generate(self, prompt: str, **decode_kwargs):
+        return self.generate_many([(prompt, decode_kwargs)])[0]
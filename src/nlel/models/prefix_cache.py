@@ -0,0 +1,67 @@
+from typing import Any, Optional, Sequence, Tuple
+from collections import OrderedDict
+
+def _to_legacy(past) -> Tuple:
+    """Normalize a transformers cache object into a tuple of per-layer (key, value) tensors."""
+    if hasattr(past, "to_legacy_cache"):
+        return past.to_legacy_cache()
+    if hasattr(past, "layers"):
+        return tuple((layer.keys, layer.values) for layer in past.layers)
+    return tuple(past)
+
+def _nbytes(legacy: Tuple) -> int:
+    return sum(int(t.numel()) * int(t.element_size()) for layer in legacy for t in layer[:2])
+
+def fork_past(legacy: Tuple, batch_size: int):
+    """Copy a cached single-row prefix into a fresh cache for `batch_size` rows (generate() mutates its cache)."""
+    rows = tuple((k.repeat(batch_size, 1, 1, 1), v.repeat(batch_size, 1, 1, 1)) for k, v, *_ in legacy)
+    try:
+        from transformers import DynamicCache  # type: ignore
+        return DynamicCache.from_legacy_cache(rows)
+    except Exception:
+        return rows
+
+def common_prefix_len(rows: Sequence[Sequence[int]]) -> int:
+    if not rows: return 0
+    n = min(len(r) for r in rows); first = rows[0]
+    for i in range(n):
+        t = first[i]
+        if any(r[i] != t for r in rows[1:]): return i
+    return n
+
+class PrefixKVCache:
+    """
+    LRU of prompt-prefix past_key_values keyed by the prefix token ids, bounded by tensor memory.
+    Entries hold a single row; callers fork them with `fork_past` before handing them to generate().
+    """
+    def __init__(self, max_bytes: int, min_tokens: int = 16):
+        self.max_bytes = int(max_bytes); self.min_tokens = int(min_tokens)
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[Tuple, int]]" = OrderedDict()
+        self.bytes = 0; self.hits = 0; self.misses = 0
+    def __len__(self) -> int:
+        return len(self._entries)
+    def get(self, prefix: Sequence[int]) -> Optional[Tuple]:
+        key = tuple(prefix); hit = self._entries.get(key)
+        if hit is None: self.misses += 1; return None
+        self._entries.move_to_end(key); self.hits += 1
+        return hit[0]
+    def longest(self, ids: Sequence[int]) -> Tuple[int, Optional[Tuple]]:
+        """Longest cached prefix strictly shorter than `ids` (at least one token must remain to decode from)."""
+        for n in sorted({len(k) for k in self._entries}, reverse=True):
+            key = tuple(ids[:n])
+            if n >= len(ids) or key not in self._entries: continue
+            self._entries.move_to_end(key); self.hits += 1
+            return n, self._entries[key][0]
+        self.misses += 1
+        return 0, None
+    def put(self, prefix: Sequence[int], past: Any) -> Tuple:
+        legacy = _to_legacy(past); size = _nbytes(legacy); key = tuple(prefix)
+        if size > self.max_bytes: return legacy
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (legacy, size); self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, old) = self._entries.popitem(last=False); self.bytes -= old
+        return legacy
+    def clear(self) -> None:
+        self._entries.clear(); self.bytes = 0
@@ -0,0 +1,96 @@
+from typing import Any, Dict, List, Optional, Tuple
+import contextvars, json, os, threading, time
+from .base import TextModel
+
+ROLES = ("reasoner", "labeller", "tuner", "labeller_tuner", "evaluator", "verifier")
+_DEPTH: contextvars.ContextVar = contextvars.ContextVar("nlel_trace_depth", default=None)
+
+def set_depth(depth: Optional[int]) -> None:
+    """Tree depth attached to the model calls that follow in this context (controllers set it per level)."""
+    _DEPTH.set(depth)
+
+def current_depth() -> Optional[int]:
+    return _DEPTH.get()
+
+class Tracer:
+    """
+    Collects one event per model call: role, tree depth, wall time, queueing time (async calls waiting on
+    the concurrency limit), time to first token where the backend reports it, rows in the call, token usage
+    and cache hits. Export with `export` (".json" -> Chrome trace for chrome://tracing / Perfetto, else JSONL).
+    """
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []; self._lock = threading.Lock(); self._t0 = time.perf_counter()
+    def record(self, role: str, start: float, end: float, outs: List[Tuple[str, Dict[str, Any]]], queue_s: float = 0.0) -> None:
+        ev = {"role": role, "depth": current_depth(), "start_s": start - self._t0, "wall_s": end - start, "queue_s": queue_s, "rows": len(outs),
+              "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "ttft_s": None, "thread": threading.get_ident()}
+        for _, meta in outs:
+            u = (meta or {}).get("usage", {})
+            ev["prompt_tokens"] += int(u.get("prompt_tokens", 0)); ev["completion_tokens"] += int(u.get("completion_tokens", 0))
+            hit = bool((meta or {}).get("cache_hit")); ev["cache_hits"] += int(hit)
+            t = None if hit else (meta or {}).get("ttft_s")  # a replayed meta keeps the original call's timing
+            if t is not None: ev["ttft_s"] = t if ev["ttft_s"] is None else min(ev["ttft_s"], t)
+        with self._lock: self.events.append(ev)
+    def aggregates(self) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock: events = list(self.events)
+        for ev in events:
+            a = out.setdefault(ev["role"], {"calls": 0, "rows": 0, "wall_s": 0.0, "queue_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "ttft_n": 0, "ttft_s": 0.0})
+            a["calls"] += 1; a["rows"] += ev["rows"]; a["wall_s"] += ev["wall_s"]; a["queue_s"] += ev["queue_s"]
+            a["prompt_tokens"] += ev["prompt_tokens"]; a["completion_tokens"] += ev["completion_tokens"]; a["cache_hits"] += ev["cache_hits"]
+            if ev["ttft_s"] is not None: a["ttft_n"] += 1; a["ttft_s"] += ev["ttft_s"]
+        return out
+    def export(self, path: str) -> None:
+        with self._lock: events = list(self.events)
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                pid = os.getpid()
+                trace = [{"name": ev["role"], "cat": "model", "ph": "X", "ts": int(ev["start_s"] * 1e6), "dur": max(1, int(ev["wall_s"] * 1e6)), "pid": pid, "tid": ev["thread"],
+                          "args": {k: v for k, v in ev.items() if k not in ("role", "start_s", "wall_s", "thread")}} for ev in events]
+                json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+            else:
+                for ev in events: f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+
+class TracingTextModel(TextModel):
+    """
+    Wraps a TextModel and records every call into a Tracer under a role tag; `with_role` gives siblings sharing
+    the tracer and the inner model's concurrency limit.
+    """
+    def __init__(self, inner: TextModel, tracer: Tracer, role: str = "reasoner"):
+        self.inner = inner; self.tracer = tracer; self.role = role
+        self.native_batch = getattr(inner, "native_batch", False); self.max_concurrency = getattr(inner, "max_concurrency", TextModel.max_concurrency)
+    def with_role(self, role: str) -> "TracingTextModel":
+        return TracingTextModel(self.inner, self.tracer, role)
+    def token_counter(self):
+        return self.inner.token_counter()
+    def _semaphore(self):
+        # The inner model's limiter, so every role view of one backend shares its concurrency limit.
+        return self.inner._semaphore()
+    def _timed(self, fn, *args, **kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        start = time.perf_counter(); outs = fn(*args, **kwargs)
+        self.tracer.record(self.role, start, time.perf_counter(), outs); return outs
+    def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        return self._timed(lambda: [self.inner.generate(prompt, **decode_kwargs)])[0]
+    def batch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        return self._timed(self.inner.batch_generate, prompts, **decode_kwargs)
+    def generate_many(self, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        return self._timed(self.inner.generate_many, requests)
+    async def agenerate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        submitted = time.perf_counter()
+        async with self._semaphore():
+            start = time.perf_counter(); out = await self.inner._agenerate(prompt, **decode_kwargs)
+        self.tracer.record(self.role, start, time.perf_counter(), [out], queue_s=start - submitted)
+        return out
+    async def abatch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        if self.native_batch:
+            import asyncio, functools
+            async with self._semaphore():
+                return await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.batch_generate, prompts, **decode_kwargs))
+        return await super().abatch_generate(prompts, **decode_kwargs)
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+def role_model(model: TextModel, role: str) -> TextModel:
+    """The role-tagged view of a traced model; untraced models are returned unchanged."""
+    return model.with_role(role) if isinstance(model, TracingTextModel) else model
@@ -1,5 +1,100 @@
-import os
+import os, string, functools
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+_HERE = os.path.dirname(__file__)
+
+# Placeholders each shipped template must use, checked when the template is first loaded.
+PROMPT_FIELDS: Dict[str, FrozenSet[str]] = {
+    "labeller.txt": frozenset({"parent", "context_json", "max_labels"}),
+    "tuner_jpe.txt": frozenset({"p0_json", "ledger_block", "parent", "label", "context_json"}),
+    "evaluator.txt": frozenset({"task", "candidate"}),
+    "verifier.txt": frozenset({"task", "candidate", "strictness"}),
+    "react.txt": frozenset(),
+    "labeller_tuner.txt": frozenset({"p0_json", "ledger_block", "parent", "context_json", "max_labels"}),
+}
+
+class PromptTemplate:
+    """
+    A str.format template parsed once into literal chunks and named fields. Only plain identifiers are
+    allowed as placeholders (no positional, attribute or index fields); `format` joins the chunks without
+    re-parsing the template, and `partial` binds some fields ahead of time (e.g. the task of a level).
+    """
+    __slots__ = ("name", "text", "fields", "_parts")
+    def __init__(self, name: str, text: str, parts: Optional[List[Tuple[str, Optional[str], str, Optional[str]]]] = None):
+        self.name = name; self.text = text
+        if parts is None:
+            parts = []
+            for literal, field, spec, conv in string.Formatter().parse(text):
+                if field is not None and not field.isidentifier():
+                    raise ValueError(f"Prompt {name}: unsupported placeholder {{{field}}}")
+                if spec and "{" in spec:
+                    raise ValueError(f"Prompt {name}: nested placeholders are not supported in {{{field}:{spec}}}")
+                parts.append((literal, field, spec or "", conv))
+        self._parts = parts
+        self.fields: FrozenSet[str] = frozenset(f for _, f, _, _ in parts if f is not None)
+    @staticmethod
+    def _render(value: Any, spec: str, conv: Optional[str]) -> str:
+        if conv == "r": value = repr(value)
+        elif conv == "s": value = str(value)
+        elif conv == "a": value = ascii(value)
+        return format(value, spec) if spec else str(value)
+    def format(self, **kwargs: Any) -> str:
+        missing = self.fields.difference(kwargs)
+        if missing: raise KeyError(f"Prompt {self.name}: missing fields {sorted(missing)}")
+        out = []
+        for literal, field, spec, conv in self._parts:
+            out.append(literal)
+            if field is not None: out.append(self._render(kwargs[field], spec, conv))
+        return "".join(out)
+    def partial(self, **kwargs: Any) -> "PromptTemplate":
+        """Template with the given fields rendered in; the rest stay placeholders."""
+        parts: List[Tuple[str, Optional[str], str, Optional[str]]] = []; lit = ""
+        for literal, field, spec, conv in self._parts:
+            lit += literal
+            if field is None: continue
+            if field in kwargs: lit += self._render(kwargs[field], spec, conv); continue
+            parts.append((lit, field, spec, conv)); lit = ""
+        parts.append((lit, None, "", None))
+        return PromptTemplate(self.name, self.text, parts)
+    def prefix(self, field: str, **kwargs: Any) -> str:
+        """Rendered text up to the first occurrence of `field` (a shared head that backends may cache)."""
+        out = []
+        for literal, f, spec, conv in self._parts:
+            out.append(literal)
+            if f == field: return "".join(out)
+            if f is not None: out.append(self._render(kwargs[f], spec, conv))
+        raise KeyError(f"Prompt {self.name}: no placeholder {{{field}}}")
+    def __str__(self) -> str:
+        return self.text
+
+def reload_enabled() -> bool:
+    """NLEL_PROMPTS_RELOAD=1 re-reads templates whose file changed on disk (for prompt development)."""
+    return os.getenv("NLEL_PROMPTS_RELOAD", "0") == "1"
+
+def _path(name: str) -> str:
+    return os.path.join(_HERE, name)
+
+@functools.lru_cache(maxsize=None)
+def _compile(name: str, mtime: float) -> PromptTemplate:
+    with open(_path(name), "r", encoding="utf-8") as f:
+        tmpl = PromptTemplate(name, f.read())
+    expected = PROMPT_FIELDS.get(name)
+    if expected is not None and tmpl.fields != expected:
+        raise ValueError(f"Prompt {name}: placeholders {sorted(tmpl.fields)} do not match expected {sorted(expected)}")
+    return tmpl
+
+_LOADED: Dict[str, PromptTemplate] = {}
+
+def get_template(name: str) -> PromptTemplate:
+    """Compiled template, read from disk once per process (or on change, with NLEL_PROMPTS_RELOAD=1)."""
+    tmpl = _LOADED.get(name)
+    if tmpl is None or reload_enabled():
+        tmpl = _LOADED[name] = _compile(name, os.path.getmtime(_path(name)))
+    return tmpl
+
+def reload_prompts() -> None:
+    """Drop every compiled template; the next get_template call reads the files again."""
+    _LOADED.clear(); _compile.cache_clear()
+
 def load_prompt(name: str) -> str:
-    here = os.path.dirname(__file__)
-    with open(os.path.join(here, name),"r",encoding="utf-8") as f:
-        return f.read()
+    return get_template(name).text
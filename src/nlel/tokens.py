@@ -1,13 +1,102 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import os, threading
+
 def approx_tokens(text: str) -> int:
     if not text: return 0
     return max(1, int(len(text) / 4))
 
+class TokenCounter:
+    """
+    Token counts with a per-string LRU memo: prompts recur across levels, votes and retries, so each distinct
+    string is tokenized once. The memo is keyed by (hash, length) of the string rather than the string, so a
+    long-lived counter holds no prompt text; a collision would need equal lengths and equal 64-bit hashes. `count_many` looks every string up first and tokenizes the misses in one batch.
+    Subclasses implement `_encode_many` (lengths for a list of strings); the base is the len/4 estimate.
+    """
+    name = "approx"
+    def __init__(self, cache_size: int = 4096):
+        self.cache_size = cache_size; self._memo: "OrderedDict[Tuple[int, int], int]" = OrderedDict(); self._lock = threading.Lock()
+        self.hits = 0; self.misses = 0
+    def _encode_many(self, texts: List[str]) -> List[int]:
+        return [approx_tokens(t) for t in texts]
+    @staticmethod
+    def _key(text: str) -> Tuple[int, int]:
+        return hash(text), len(text)  # str caches its hash, so repeat lookups do not rescan the prompt
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+    def count_many(self, texts: List[str]) -> List[int]:
+        out: List[Optional[int]] = [None] * len(texts); todo: Dict[Tuple[int, int], List[int]] = {}; misses: List[str] = []
+        keys = [self._key(t) for t in texts]
+        with self._lock:
+            for i, (t, k) in enumerate(zip(texts, keys)):
+                if not t: out[i] = 0; continue
+                n = self._memo.get(k)
+                if n is None:
+                    if k not in todo: todo[k] = []; misses.append(t)
+                    todo[k].append(i); continue
+                self._memo.move_to_end(k); out[i] = n; self.hits += 1
+        if todo:
+            counts = self._encode_many(misses)
+            with self._lock:
+                self.misses += len(misses)
+                for k, n in zip(todo, counts):
+                    for i in todo[k]: out[i] = n
+                    if self.cache_size > 0:
+                        self._memo[k] = n; self._memo.move_to_end(k)
+                while len(self._memo) > self.cache_size: self._memo.popitem(last=False)
+        return out  # type: ignore[return-value]
+
+class TiktokenCounter(TokenCounter):
+    """OpenAI BPE counts; `encoding` is a tiktoken encoding name or a model name (e.g. gpt-4o-mini)."""
+    def __init__(self, encoding: str = "cl100k_base", cache_size: int = 4096):
+        super().__init__(cache_size)
+        import tiktoken
+        try:
+            self.enc = tiktoken.get_encoding(encoding)
+        except ValueError:
+            self.enc = tiktoken.encoding_for_model(encoding)
+        self.name = f"tiktoken:{self.enc.name}"
+    def _encode_many(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.enc.encode_batch(texts, disallowed_special=())]
+
+class HFTokenCounter(TokenCounter):
+    """Counts with a Hugging Face tokenizer (no special tokens); pass a loaded `tokenizer` or a local name/path."""
+    def __init__(self, name_or_path: Optional[str] = None, tokenizer=None, cache_size: int = 4096):
+        super().__init__(cache_size)
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(name_or_path, local_files_only=True, use_fast=True)
+        self.tokenizer = tokenizer; self.name = f"hf:{name_or_path or getattr(tokenizer, 'name_or_path', '')}"
+    def _encode_many(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False).input_ids]
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+_COUNTERS_LOCK = threading.Lock()
+
+def get_token_counter(spec: Optional[str] = None) -> TokenCounter:
+    """
+    Shared counter for a spec: "approx" (len/4), "tiktoken[:<encoding or model>]" or "hf:<name_or_path>".
+    Env: NLEL_TOKENIZER (default "approx") when no spec is given.
+    """
+    spec = spec or os.getenv("NLEL_TOKENIZER", "approx")
+    with _COUNTERS_LOCK:
+        counter = _COUNTERS.get(spec)
+        if counter is None:
+            kind, _, name = spec.partition(":")
+            if kind == "approx": counter = TokenCounter()
+            elif kind == "tiktoken": counter = TiktokenCounter(name or "cl100k_base")
+            elif kind == "hf": counter = HFTokenCounter(name)
+            else: raise ValueError(f"Unsupported tokenizer spec: {spec}")
+            _COUNTERS[spec] = counter
+    return counter
+
 class TokenBank:
     def __init__(self):
         self.prompt_tokens = 0
         self.completion_tokens = 0
-    def add(self, prompt: int = 0, completion: int = 0):
-        self.prompt_tokens += int(prompt); self.completion_tokens += int(completion)
+    def add(self, prompt: int = 0, completion: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0, **_):
+        # Callers pass usage dicts (`tb.add(**meta["usage"])`); accept their key names too.
+        self.prompt_tokens += int(prompt) + int(prompt_tokens); self.completion_tokens += int(completion) + int(completion_tokens)
     @property
     def total(self) -> int:
         return self.prompt_tokens + self.completion_tokens
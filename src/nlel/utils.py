@@ -1,5 +1,5 @@
 import os, json, datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Iterable, Set, Tuple
 
 def now_ts() -> str:
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -7,11 +7,72 @@ def now_ts() -> str:
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
+_SEED_STATE: Dict[str, Any] = {"seed": None, "epoch": 0}
+
 def set_seed(seed: int):
     import numpy as np, random
     random.seed(seed); np.random.seed(seed)
+    _SEED_STATE["seed"] = int(seed); _SEED_STATE["epoch"] += 1
+
+def current_seed():
+    """Seed passed to the last `set_seed` call (None if never seeded) and how many times it has been called."""
+    return _SEED_STATE["seed"], _SEED_STATE["epoch"]
 
 def safe_jsonl_write(path: str, rows: List[Dict[str, Any]]):
     with open(path, "w", encoding="utf-8") as f:
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read rows back, skipping blank or torn lines (e.g. the tail of a run that crashed mid-write)."""
+    rows: List[Dict[str, Any]] = []
+    if not os.path.exists(path): return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            try:
+                rows.append(json.loads(line))
+            except Exception:
+                pass
+    return rows
+
+RESUME_KEY = ("seed", "id", "controller", "budget_multiplier")
+
+def row_key(row: Dict[str, Any], fields: Iterable[str] = RESUME_KEY) -> Tuple:
+    out = []
+    for k in fields:
+        v = row.get(k)
+        out.append(float(v) if k == "budget_multiplier" and v is not None else (str(v) if k == "id" else v))
+    return tuple(out)
+
+def completed_keys(path: str, fields: Iterable[str] = RESUME_KEY) -> Set[Tuple]:
+    fields = tuple(fields)
+    return {row_key(r, fields) for r in read_jsonl(path)}
+
+class JsonlAppender:
+    """
+    Append-as-you-go JSONL writer. Every row is flushed to the OS; fsync runs every `fsync_every` rows
+    and on close. Opening in append mode first trims a torn trailing line left by a crash.
+    """
+    def __init__(self, path: str, append: bool = True, fsync_every: int = 16):
+        self.path = path; self.fsync_every = max(1, int(fsync_every)); self._pending = 0
+        if append: self._trim_torn_tail(path)
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+    @staticmethod
+    def _trim_torn_tail(path: str):
+        if not os.path.exists(path) or os.path.getsize(path) == 0: return
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n": return
+            f.seek(0); data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+    def write(self, row: Dict[str, Any]):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n"); self._f.flush(); self._pending += 1
+        if self._pending >= self.fsync_every: self.sync()
+    def sync(self):
+        self._f.flush(); os.fsync(self._f.fileno()); self._pending = 0
+    def close(self):
+        if not self._f.closed: self.sync(); self._f.close()
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Check of the async model surface against a local fake OpenAI-compatible HTTP server.
+
+  - abatch_generate keeps at most max_concurrency requests in flight,
+  - one AsyncOpenAI client (one connection pool) serves every call of an event loop,
+  - aclose() closes the loop's connections, and a second asyncio.run works with a fresh client,
+  - a native-batch backend's abatch_generate takes a slot of the same limit per batch.
+
+Usage (from src/):
+  python scripts/check_async_models.py
+  python scripts/check_async_models.py --requests 48 --concurrency 6 --delay-ms 20
+"""
+import argparse, asyncio, json, os, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nlel.models.base import OpenAIChatModel, TextModel
+
+class FakeServer:
+    """Chat-completions endpoint that sleeps `delay_s` per request and counts in-flight requests and connections."""
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s; self.lock = threading.Lock()
+        self.in_flight = 0; self.max_in_flight = 0; self.requests = 0; self.open_conns = 0; self.conns = 0
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections are visible as one connection
+            def log_message(self, *args): pass
+            def setup(self):
+                super().setup()
+                with server.lock: server.open_conns += 1; server.conns += 1
+            def finish(self):
+                with server.lock: server.open_conns -= 1
+                super().finish()
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with server.lock: server.in_flight += 1; server.requests += 1; server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                time.sleep(server.delay_s)
+                with server.lock: server.in_flight -= 1
+                prompt = body["messages"][0]["content"]
+                out = json.dumps({"id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+                                  "choices": [{"index": 0, "message": {"role": "assistant", "content": f"echo {prompt}"}, "finish_reason": "stop"}],
+                                  "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}}).encode("utf-8")
+                self.send_response(200); self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(out)))
+                self.end_headers(); self.wfile.write(out)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler); self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}/v1"
+    def reset(self) -> None:
+        with self.lock: self.max_in_flight = 0; self.requests = 0; self.conns = 0
+    def wait_closed(self, timeout_s: float = 2.0) -> int:
+        end = time.time() + timeout_s
+        while self.open_conns and time.time() < end: time.sleep(0.01)
+        return self.open_conns
+
+class NativeBatchProbe(TextModel):
+    """native_batch backend whose batch_generate records how many batches run at once."""
+    native_batch = True
+    def __init__(self, max_concurrency: int, delay_s: float):
+        self.max_concurrency = max_concurrency; self.delay_s = delay_s; self.lock = threading.Lock(); self.in_flight = 0; self.max_in_flight = 0
+    def batch_generate(self, prompts: List[str], **decode_kwargs) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock: self.in_flight += 1; self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay_s)
+        with self.lock: self.in_flight -= 1
+        return [(p, {"usage": {"prompt_tokens": 1, "completion_tokens": 1}}) for p in prompts]
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=24, help="Prompts per abatch_generate call")
+    ap.add_argument("--concurrency", type=int, default=4, help="max_concurrency of the model under test")
+    ap.add_argument("--delay-ms", type=float, default=30.0, help="Server-side latency per request")
+    args = ap.parse_args()
+    server = FakeServer(args.delay_ms / 1000)
+    model = OpenAIChatModel("fake-model", api_key="fake", base_url=server.url, max_concurrency=args.concurrency, tokenizer="approx")
+    problems: List[str] = []
+
+    async def one_loop(tag: str) -> Tuple[List[Tuple[str, Dict[str, Any]]], bool]:
+        prompts = [f"{tag}-{i}" for i in range(args.requests)]
+        first = await model.abatch_generate(prompts[: len(prompts) // 2])
+        client = model._aclient()
+        rest = await model.abatch_generate(prompts[len(prompts) // 2:])
+        reused = model._aclient() is client
+        await model.aclose()
+        return first + rest, reused
+
+    clients = []
+    for run in ("run1", "run2"):
+        server.reset()
+        outs, reused = asyncio.run(one_loop(run))
+        clients.append(len(model._aclients))
+        if [t for t, _ in outs] != [f"echo {run}-{i}" for i in range(args.requests)]: problems.append(f"{run}: wrong or reordered outputs")
+        if server.requests != args.requests: problems.append(f"{run}: {server.requests} requests, expected {args.requests}")
+        if server.max_in_flight > args.concurrency: problems.append(f"{run}: {server.max_in_flight} requests in flight, limit {args.concurrency}")
+        if not reused: problems.append(f"{run}: a new client was opened within one event loop")
+        if server.conns > args.concurrency: problems.append(f"{run}: {server.conns} connections opened, expected at most {args.concurrency} (pool not reused)")
+        left = server.wait_closed()
+        if left: problems.append(f"{run}: {left} connections still open after aclose()")
+        print(f"{run}: {server.requests} requests, max {server.max_in_flight} in flight, {server.conns} connections, {left} open after aclose")
+    if any(clients): problems.append(f"clients left cached after aclose(): {clients}")
+
+    probe = NativeBatchProbe(max_concurrency=1, delay_s=args.delay_ms / 1000)
+    async def batches():
+        return await asyncio.gather(*(probe.abatch_generate([f"b{i}-{j}" for j in range(3)]) for i in range(4)))
+    asyncio.run(batches())
+    if probe.max_in_flight > 1: problems.append(f"native batch: {probe.max_in_flight} batches in flight, limit 1")
+    print(f"native batch: max {probe.max_in_flight} batches in flight (limit 1)")
+
+    server.httpd.shutdown(); server.httpd.server_close()
+    for p in problems: print(f"FAIL {p}")
+    print("ok" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
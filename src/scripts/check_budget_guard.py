@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Check of the pre-dispatch budget guard (controllers.budget) on a multi-level dummy model.
+
+For each budget, NLEL runs under label_concurrency "serial", "threads" and "batch", and ToT runs once.
+The check fails if
+  - a guarded run spends more than its budget, or
+  - "threads" and "batch" spend different totals (both hand the level budget to (node, label) pairs in
+    pair order and score a level's steps in one deduplicated batch, so on this deterministic dummy they
+    should trim, skip and charge alike), or
+  - with the guard off, a row derived from a large run's trace (controllers.anytime, as --anytime does)
+    differs from a direct run at the smaller cap (run_experiment refuses --anytime with the guard on).
+
+Usage (from src/):
+  python scripts/check_budget_guard.py
+  python scripts/check_budget_guard.py --budgets 800 2500 6000 --final-depth 8
+"""
+import argparse, os, sys
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nlel.models.base import DummyModel
+from nlel.controllers.nlel import Labeller, TunerJPE, run_instance
+from nlel.controllers.tot_baseline import run_tot
+from nlel.controllers.anytime import outcome_at_budget
+
+TASK = "A train leaves at 3pm at 60 km/h; a second leaves the same station at 4pm at 90 km/h. When does it catch up?"
+
+class DeepDummy(DummyModel):
+    """Dummy whose steps extend their parent and only reach a final answer at `final_depth`."""
+    def __init__(self, final_depth: int):
+        super().__init__(); self.final_depth = final_depth
+    def generate(self, prompt: str, **decode_kwargs) -> Tuple[str, Dict[str, Any]]:
+        text, meta = super().generate(prompt, **decode_kwargs)
+        if "Parent step:\n" not in prompt: return text, meta
+        parent = prompt.split("Parent step:\n", 1)[1].split("\n\n")[0]
+        text = parent + " | step: reduce to relative speed" + (" Final Answer: 6pm" if parent.count("|") + 1 >= self.final_depth else "")
+        n_prompt, n_completion = self.token_counter().count_many([prompt, text])
+        return text, {"usage": {"prompt_tokens": n_prompt, "completion_tokens": n_completion}}
+
+def nlel_run(budget: int, mode: str, final_depth: int, trace=None, budget_guard: bool = True) -> Dict[str, Any]:
+    m = DeepDummy(final_depth)
+    return run_instance(TASK, "6pm", m, budget_tokens=budget, labeller=Labeller(m, max_labels=3), tuner=TunerJPE(m), label_concurrency=mode, trace=trace, budget_guard=budget_guard)
+
+def tot_run(budget: int, final_depth: int, trace=None, budget_guard: bool = True) -> Dict[str, Any]:
+    return run_tot(TASK, DeepDummy(final_depth), gold_answer="6pm", budget_tokens=budget, trace=trace, budget_guard=budget_guard)
+
+def anytime_mismatches(final_depth: int, largest: int, caps: List[int]) -> List[str]:
+    """Unguarded rows derived from one run at `largest` that differ from direct runs at each cap."""
+    runs = {"tot": lambda b, tr: tot_run(b, final_depth, tr, budget_guard=False)}
+    for mode in ("threads", "batch"): runs[f"nlel-{mode}"] = lambda b, tr, mode=mode: nlel_run(b, mode, final_depth, tr, budget_guard=False)
+    out = []
+    for name, run in runs.items():
+        trace: List[Dict[str, Any]] = []; big = run(largest, trace)
+        for cap in caps:
+            derived = outcome_at_budget(big, trace, cap); direct = run(cap, None)
+            fields = [k for k in ("final", "tokens_total", "correct") if derived.get(k) != direct.get(k)]
+            if fields: out.append(f"{name} at cap {cap}: derived " + ", ".join(f"{k}={derived.get(k)!r} vs direct {direct.get(k)!r}" for k in fields))
+    return out
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budgets", type=int, nargs="*", default=list(range(500, 6001, 300)), help="Token budgets to run at")
+    ap.add_argument("--final-depth", type=int, default=12, help="Depth at which the dummy's steps reach a final answer")
+    args = ap.parse_args()
+    problems: List[str] = []
+    for budget in args.budgets:
+        spent = {mode: nlel_run(budget, mode, args.final_depth)["tokens_total"] for mode in ("serial", "threads", "batch")}
+        spent["tot"] = tot_run(budget, args.final_depth)["tokens_total"]
+        print(f"budget {budget:6d}: " + "  ".join(f"{k} {v:6d}" for k, v in spent.items()))
+        for k, v in spent.items():
+            if v > budget: problems.append(f"budget {budget}: {k} spent {v}")
+        if spent["threads"] != spent["batch"]:
+            problems.append(f"budget {budget}: threads spent {spent['threads']}, batch {spent['batch']}")
+    caps = list(range(300, 16001, 700)); mismatches = anytime_mismatches(6, 16000, caps)
+    print(f"anytime, guard off: {len(mismatches)} of {3 * len(caps)} derived rows differ from direct runs")
+    problems.extend(mismatches)
+    for p in problems: print(f"FAIL {p}")
+    print("ok" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Import-time guard for the CLI entry points.
+
+Imports each entry module in a fresh interpreter under `python -X importtime` and fails if
+  - it pulls in a heavy dependency that should only load on the code path that uses it
+    (datasets, pandas, torch, transformers, ...), or
+  - its cumulative import time exceeds --max-ms (best of --repeat runs).
+
+Usage (from src/):
+  python scripts/check_importtime.py
+  python scripts/check_importtime.py --max-ms 600 --repeat 5 --show 10
+"""
+import argparse, os, subprocess, sys
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = (
+    "nlel.experiments.run_experiment",
+    "nlel.experiments.run_experiment_splitrole",
+    "nlel.experiments.run_pilot_v2",
+    "nlel.experiments.sweep",
+    "nlel.contrib.admissions_min",
+    "nlel.data.cache",
+)
+HEAVY = ("datasets", "pandas", "torch", "transformers", "matplotlib", "pyarrow", "openai", "tiktoken", "scipy", "sklearn")
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def import_times(module: str) -> List[Tuple[int, int, str]]:
+    """(self_us, cumulative_us, dotted name) per imported module, in import order."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC] + [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"{module}: import failed\n{proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ''}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cum_us), name.strip()))
+    return rows
+
+def check(module: str, repeat: int) -> Tuple[float, Dict[str, float], List[Tuple[int, int, str]]]:
+    best = None
+    for _ in range(max(1, repeat)):
+        rows = import_times(module)
+        total = next((cum for _, cum, name in reversed(rows) if name == module), sum(s for s, _, _ in rows))
+        if best is None or total < best[0]: best = (total, rows)
+    total, rows = best
+    heavy: Dict[str, float] = {}
+    for _, cum, name in rows:
+        top = name.split(".")[0]
+        if top in HEAVY and name == top: heavy[top] = cum / 1000
+    return total / 1000, heavy, rows
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modules", nargs="*", default=list(ENTRY_POINTS), help="Entry modules to check")
+    ap.add_argument("--max-ms", type=float, default=float(os.getenv("NLEL_IMPORT_MAX_MS", "1000")), help="Cumulative import-time limit per module")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest counts")
+    ap.add_argument("--show", type=int, default=0, help="Also print the N slowest imports of each module")
+    args = ap.parse_args()
+    failed = False
+    for module in args.modules:
+        total, heavy, rows = check(module, args.repeat)
+        problems = [f"imports {name} ({ms:.0f} ms)" for name, ms in sorted(heavy.items())]
+        if total > args.max_ms: problems.append(f"over the {args.max_ms:.0f} ms limit")
+        print(f"{'FAIL' if problems else 'ok  '} {module}: {total:.0f} ms" + (f" - {'; '.join(problems)}" if problems else ""))
+        for self_us, cum_us, name in sorted(rows, key=lambda r: -r[0])[:args.show]:
+            print(f"       {self_us / 1000:7.1f} ms self  {cum_us / 1000:7.1f} ms cumulative  {name}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())